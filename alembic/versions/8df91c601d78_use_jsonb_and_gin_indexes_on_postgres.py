@@ -0,0 +1,56 @@
+"""Use JSONB and GIN indexes for JSON columns on PostgreSQL
+
+Revision ID: 8df91c601d78
+Revises: b38d3f2223a2
+Create Date: 2026-10-16 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8df91c601d78'
+down_revision: Union[str, Sequence[str], None] = 'b38d3f2223a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_COLUMNS = [
+    ('users', 'courses'),
+    ('attendance_records', 'fraud_flags'),
+    ('system_logs', 'details'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # JSONB/GIN only exist on PostgreSQL; other backends keep plain JSON
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column,
+                   existing_type=sa.JSON(),
+                   type_=postgresql.JSONB(),
+                   postgresql_using=f'{column}::jsonb')
+    op.create_index('idx_record_fraud_flags', 'attendance_records', ['fraud_flags'],
+                    unique=False, postgresql_using='gin')
+    op.create_index('idx_log_details', 'system_logs', ['details'],
+                    unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('idx_log_details', table_name='system_logs')
+    op.drop_index('idx_record_fraud_flags', table_name='attendance_records')
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column,
+                   existing_type=postgresql.JSONB(),
+                   type_=sa.JSON(),
+                   postgresql_using=f'{column}::json')
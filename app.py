@@ -27,8 +27,8 @@ def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static'),
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, 
+# Configure logging (LOG_LEVEL, default INFO; DEBUG logs every request detail)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     handlers=[
                         logging.FileHandler("app.log"),
@@ -40,48 +40,49 @@ def register_student():
     
     face_matcher = FaceMatcher()
     
-    # Load existing database
+    # Load existing database; the store may be the .pkl or its .npy/.json
+    # replacement, and a missing store is handled by load_known_faces
     db_path = "data/face_database.pkl"
-    if os.path.exists(db_path):
-        face_matcher.load_known_faces(db_path)
+    face_matcher.load_known_faces(db_path)
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
         
-        # Display frame
-        cv2.imshow('Student Registration', frame)
+            # Display frame
+            cv2.imshow('Student Registration', frame)
         
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('c'):
-            # Capture face
-            success = face_matcher.add_known_face(frame, student_id, name)
-            if success:
-                print(f"✓ Student {name} registered successfully")
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('c'):
+                # Capture face
+                success = face_matcher.add_known_face(frame, student_id, name)
+                if success:
+                    print(f"✓ Student {name} registered successfully")
                 
-                # Save database
-                face_matcher.save_known_faces(db_path)
+                    # Save database
+                    face_matcher.save_known_faces(db_path)
                 
-                # Save face image
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"data/students/{student_id}_{name.replace(' ', '_')}_{timestamp}.jpg"
+                    # Save face image
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    filename = f"data/students/{student_id}_{name.replace(' ', '_')}_{timestamp}.jpg"
                 
-                # Ensure directory exists
-                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                    # Ensure directory exists
+                    os.makedirs(os.path.dirname(filename), exist_ok=True)
                 
-                cv2.imwrite(filename, frame)
-                print(f"✓ Face image saved: {filename}")
+                    cv2.imwrite(filename, frame)
+                    print(f"✓ Face image saved: {filename}")
                 
-                break
-            else:
-                print("❌ Failed to register face. Please try again.")
+                    break
+                else:
+                    print("❌ Failed to register face. Please try again.")
         
-        elif key == ord('q'):
-            break
-    
-    cap.release()
-    cv2.destroyAllWindows()
+            elif key == ord('q'):
+                break
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     register_student()
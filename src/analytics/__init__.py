@@ -39,6 +39,24 @@ def get_live_attendance_stats(class_id=None, hours=24):
 
     return result
 
+def _status_counts_by_session(session_ids):
+    """Count records per status name for each session in one grouped query"""
+    counts = {session_id: {} for session_id in session_ids}
+    if not counts:
+        return counts
+
+    rows = db.session.query(
+        AttendanceRecord.session_id,
+        AttendanceRecord.status,
+        func.count(AttendanceRecord.id)
+    ).filter(
+        AttendanceRecord.session_id.in_(counts.keys())
+    ).group_by(AttendanceRecord.session_id, AttendanceRecord.status).all()
+
+    for session_id, status, count in rows:
+        counts[session_id][status.name] = count
+    return counts
+
 def get_attendance_trends(days=30):
     """Get attendance trends over time"""
     start_date = datetime.now() - timedelta(days=days)
@@ -46,13 +64,14 @@ def get_attendance_trends(days=30):
     sessions = AttendanceSession.query.filter(
         AttendanceSession.session_date >= start_date.date()
     ).order_by(AttendanceSession.session_date).all()
+    counts = _status_counts_by_session([session.id for session in sessions])
 
     trends = []
     for session in sessions:
-        records = AttendanceRecord.query.filter_by(session_id=session.id).all()
-        present = len([r for r in records if r.status.name == 'PRESENT'])
-        late = len([r for r in records if r.status.name == 'LATE'])
-        absent = len([r for r in records if r.status.name == 'ABSENT'])
+        session_counts = counts[session.id]
+        present = session_counts.get('PRESENT', 0)
+        late = session_counts.get('LATE', 0)
+        absent = session_counts.get('ABSENT', 0)
 
         trends.append({
             'date': session.session_date.isoformat(),
@@ -94,10 +113,13 @@ def detect_anomalies():
     # Check for classes with unusually low attendance
     sessions_today = AttendanceSession.query.filter_by(session_date=today).all()
 
+    counts = _status_counts_by_session([session.id for session in sessions_today])
+
     anomalies = []
     for session in sessions_today:
-        records = AttendanceRecord.query.filter_by(session_id=session.id).all()
-        present_rate = len([r for r in records if r.status.name in ['PRESENT', 'LATE']]) / max(len(records), 1)
+        session_counts = counts[session.id]
+        attended = session_counts.get('PRESENT', 0) + session_counts.get('LATE', 0)
+        present_rate = attended / max(sum(session_counts.values()), 1)
 
         if present_rate < 0.5:  # Less than 50% attendance
             anomalies.append({
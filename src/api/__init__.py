@@ -3,14 +3,15 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from flask_session import Session
+from jinja2 import FileSystemBytecodeCache
 import os
+import redis
 from datetime import timedelta
 from dotenv import load_dotenv
 
-from src.models import db
+from src.models import db, check_password_hash_cost
+from src.security import SecurityConfig, limiter
 
 def create_app():
     # Load environment variables from .env file
@@ -21,6 +22,11 @@ def create_app():
     template_dir = os.path.join(project_root, 'templates')
     static_dir = os.path.join(project_root, 'static')
     app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
+    # Compiled templates persist across worker restarts; the cache is executable
+    # bytecode, so it lives in the app's private instance folder, never a shared temp dir
+    jinja_cache_dir = os.environ.get('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    os.makedirs(jinja_cache_dir, mode=0o700, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
 
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
@@ -32,17 +38,37 @@ def create_app():
         f'sqlite:///{db_path}'
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SESSION_TYPE'] = 'filesystem'
+    # Keep warm pooled connections for server databases; SQLite uses its own pool
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 40)),
+            'pool_pre_ping': True,
+            'pool_recycle': 3600,
+        }
+    # Reject oversized uploads before the multipart parser spools them
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+    # Server-side sessions live in Redis when it is configured, else on disk
+    redis_url = os.environ.get('REDIS_URL')
+    if redis_url:
+        app.config['SESSION_TYPE'] = 'redis'
+        app.config['SESSION_REDIS'] = redis.from_url(redis_url)
+    else:
+        app.config['SESSION_TYPE'] = 'filesystem'
+    # Rate limit counters follow the same choice; read here, after .env is loaded
+    app.config['RATELIMIT_STORAGE_URI'] = redis_url or 'memory://'
     app.config['SESSION_PERMANENT'] = False
+    # Also the expiry of stored sessions
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=SecurityConfig.SESSION_TIMEOUT)
     app.config['SESSION_USE_SIGNER'] = True
 
     # Initialize extensions
     CORS(app, supports_credentials=True, origins=["http://localhost:5000", "http://127.0.0.1:5000"])
     JWTManager(app)
-    limiter = Limiter(key_func=get_remote_address)
     limiter.init_app(app)
     Session(app)
     db.init_app(app)
+    check_password_hash_cost()
 
     # Register blueprints
     from .auth import auth_bp
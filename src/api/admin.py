@@ -6,16 +6,24 @@ from sqlalchemy import func
 from src.models import User, UserRole, Class, Course, Enrollment, AttendanceSession, AttendanceRecord, FaceEncoding, db, SessionStatus, AttendanceStatus
 import os
 from datetime import datetime, timedelta, date
-import pandas as pd
 from io import BytesIO
-from functools import wraps
+from functools import wraps, lru_cache
+import cv2
 from src.utils.dataset_manager import add_student, remove_student
+from src.cache import forget_cached_user, invalidate_schedules
 
 import logging
 
 admin_bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
 
+@admin_bp.after_request
+def _invalidate_schedules_after_write(response):
+    """Any successful admin write may change a class, course, enrollment or teacher name"""
+    if request.method != 'GET' and response.status_code < 400:
+        invalidate_schedules()
+    return response
+
 def admin_or_session_required(f):
     """Decorator that allows either JWT auth or session auth for admin users"""
     @wraps(f)
@@ -266,6 +274,7 @@ def update_user(user_id):
             user.courses = data['courses']
 
         db.session.commit()
+        forget_cached_user(user_id)
         logger.info("User updated successfully")
 
         return jsonify({'message': 'User updated successfully'})
@@ -299,6 +308,7 @@ def delete_user(user_id):
 
         db.session.delete(user)
         db.session.commit()
+        forget_cached_user(user_id)
         logger.info("User deleted successfully")
 
         return jsonify({'message': 'User deleted successfully'})
@@ -801,6 +811,44 @@ def add_class_session(class_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Largest edge a ?size= thumbnail request may ask for
+MAX_THUMBNAIL_SIZE = 512
+
+@lru_cache(maxsize=512)
+def _thumbnail_jpeg(path, mtime_ns, size):
+    """JPEG bytes of an image shrunk to fit size x size; mtime_ns keys out stale entries"""
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    h, w = image.shape[:2]
+    scale = size / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return buf.tobytes() if ok else None
+
+def _send_photo(path):
+    """Send a photo, or a cached thumbnail of it when the request asks for ?size="""
+    size = request.args.get('size', type=int)
+    response = None
+    if size:
+        size = min(max(size, 16), MAX_THUMBNAIL_SIZE)
+        stat = os.stat(path)
+        data = _thumbnail_jpeg(path, stat.st_mtime_ns, size)
+        if data:
+            response = send_file(BytesIO(data), mimetype='image/jpeg', conditional=True,
+                                 etag=f"{stat.st_mtime_ns}-{stat.st_size}-{size}",
+                                 last_modified=stat.st_mtime)
+    if response is None:
+        response = send_file(path, mimetype='image/jpeg', conditional=True, etag=True)
+
+    # The URL is fixed while the photo can be replaced, so let browsers keep a
+    # private copy but revalidate it; unchanged photos come back as a bodyless 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
 @admin_bp.route('/students/<int:student_id>/photo', methods=['GET'])
 @admin_or_session_required
 def get_student_photo(student_id):
@@ -829,7 +877,7 @@ def get_user_photo(user_id):
         if encoding and encoding.image_path:
             upload_path = os.path.join(os.getcwd(), 'uploads', encoding.image_path)
             if os.path.exists(upload_path):
-                return send_file(upload_path, mimetype='image/jpeg')
+                return _send_photo(upload_path)
 
         # Fallback to dataset path
         if user.username:
@@ -841,7 +889,7 @@ def get_user_photo(user_id):
                 file_path = os.path.join(base_path, f"{user.username}{ext}")
                 if os.path.exists(file_path):
                     logger.debug(f"Sending photo from {file_path}")
-                    return send_file(file_path, mimetype='image/jpeg')
+                    return _send_photo(file_path)
         else:
             logger.warning("Student has no username")
 
@@ -871,6 +919,30 @@ def get_attendance_analysis():
         # Get all students
         students = User.query.filter_by(role=UserRole.STUDENT).all()
 
+        # Build the whole table from three grouped queries instead of four per student
+        class_ids_by_student = {}
+        for student_id, class_id in db.session.query(Enrollment.student_id, Enrollment.class_id):
+            class_ids_by_student.setdefault(student_id, set()).add(class_id)
+
+        completed_by_class = dict(
+            db.session.query(AttendanceSession.class_id, func.count(AttendanceSession.id))
+            .filter(AttendanceSession.status == SessionStatus.COMPLETED)
+            .group_by(AttendanceSession.class_id)
+        )
+
+        record_counts = {}
+        rows = (
+            db.session.query(AttendanceRecord.student_id, AttendanceRecord.status, func.count(AttendanceRecord.id))
+            .join(AttendanceSession)
+            .filter(
+                AttendanceRecord.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]),
+                AttendanceSession.status == SessionStatus.COMPLETED
+            )
+            .group_by(AttendanceRecord.student_id, AttendanceRecord.status)
+        )
+        for student_id, status, count in rows:
+            record_counts[(student_id, status)] = count
+
         student_details = []
         low_attendance_students = []
         total_students = len(students)
@@ -878,30 +950,13 @@ def get_attendance_analysis():
         total_present_overall = 0
 
         for student in students:
-            # Get all classes student is enrolled in
-            enrollments = Enrollment.query.filter_by(student_id=student.id).all()
-            class_ids = [e.class_id for e in enrollments]
+            # Classes the student is enrolled in
+            class_ids = class_ids_by_student.get(student.id)
             
-            # Get all completed sessions for these classes
             if class_ids:
-                total_sessions_query = AttendanceSession.query.filter(
-                    AttendanceSession.class_id.in_(class_ids),
-                    AttendanceSession.status == SessionStatus.COMPLETED
-                )
-                total_sessions = total_sessions_query.count()
-                
-                # Get attendance records for these sessions
-                present_count = AttendanceRecord.query.join(AttendanceSession).filter(
-                    AttendanceRecord.student_id == student.id,
-                    AttendanceRecord.status == AttendanceStatus.PRESENT,
-                    AttendanceSession.status == SessionStatus.COMPLETED
-                ).count()
-                
-                late_count = AttendanceRecord.query.join(AttendanceSession).filter(
-                    AttendanceRecord.student_id == student.id,
-                    AttendanceRecord.status == AttendanceStatus.LATE,
-                    AttendanceSession.status == SessionStatus.COMPLETED
-                ).count()
+                total_sessions = sum(completed_by_class.get(class_id, 0) for class_id in class_ids)
+                present_count = record_counts.get((student.id, AttendanceStatus.PRESENT), 0)
+                late_count = record_counts.get((student.id, AttendanceStatus.LATE), 0)
                 
                 # Absent is total sessions minus (present + late)
                 # Note: This assumes if no record exists, they were absent
@@ -956,13 +1011,8 @@ def get_attendance_analysis():
 def reload_face_database():
     """Reload the face recognition database"""
     try:
-        # Import here to avoid circular imports
-        from src.camera_pipeline.attendance_system import AttendanceSystem
+        # Retrain, then drop the shared models so the next request reloads them.
         # Note: This reloads for the current process, but if multiple instances, need broadcast
-        # For now, assume single instance
-        system = AttendanceSystem()  # Create temp instance to reload global matcher?
-        # Actually, better to reload the global matcher if shared
-        # But for simplicity, just retrain
         import sys
         project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
         sys.path.append(project_root)
@@ -5,8 +5,6 @@ from functools import wraps
 from datetime import datetime, timedelta
 import cv2
 import numpy as np
-from src.face_detection.yolo_detector import YOLOFaceDetector
-from src.face_recognition.matcher import FaceMatcher
 from src.config import config
 
 import logging
@@ -55,6 +53,10 @@ matcher = None
 
 def get_models():
     global detector, matcher
+    # Imported on first use so the web app starts without loading the face
+    # recognition stack (dlib, sklearn, torch) until a frame is processed
+    from src.face_detection.yolo_detector import YOLOFaceDetector
+    from src.face_recognition.matcher import FaceMatcher
     if detector is None:
         detector = YOLOFaceDetector(
             confidence_threshold=config.get('detection.confidence_threshold', 0.5)
@@ -71,11 +73,10 @@ def get_models():
     return detector, matcher
 
 def reload_models():
-    """Force reload of AI models"""
-    global detector, matcher
-    detector = None
+    """Force reload of the face database; the detector weights never change and are kept"""
+    global matcher
     matcher = None
-    logger.info("Models cleared for reload")
+    logger.info("Face matcher cleared for reload")
 
 # Global cache for recognition
 # Format: {session_id: [{'box': [x1, y1, x2, y2], 'id': student_id, 'name': name, 'timestamp': time.time(), 'conf': conf}]}
@@ -125,7 +126,7 @@ def process_frame():
         detector, matcher = get_models()
         
         # Detect faces
-        faces = detector.detect_faces_with_confidence(frame)
+        faces = detector.detect_faces_downscaled(frame)
         # logger.debug(f"Detected {len(faces)} faces in frame")
 
         recognitions = []
@@ -2,7 +2,7 @@
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
-from src.models import User
+from src.models import db, User
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,7 +13,12 @@ def login():
     password = data.get('password')
 
     user = User.query.filter_by(username=username).first()
-    if user and user.check_password(password):
+    if user is None:
+        User.check_dummy_password(password)
+    elif user.check_password(password):
+        # Persist a transparently upgraded password hash
+        if db.session.is_modified(user):
+            db.session.commit()
         access_token = create_access_token(identity=username)
         return jsonify({
             'access_token': access_token,
@@ -1,8 +1,12 @@
 # src/cache.py - Redis caching configuration
 
+import json
 import redis
 from flask_caching import Cache
 import os
+from types import SimpleNamespace
+
+from src.models import User, UserRole
 
 import logging
 
@@ -28,6 +32,7 @@ cache = Cache(config=cache_config)
 class CacheKeys:
     # User-related caches
     USER_PROFILE = 'user:profile:{}'
+    USER_RECORD = 'user:{}'
     USER_PERMISSIONS = 'user:permissions:{}'
 
     # Attendance caches
@@ -40,6 +45,11 @@ class CacheKeys:
     CLASS_DETAILS = 'class:details:{}'
     COURSE_SCHEDULE = 'course:schedule:{}'  # class_id
 
+    # Dashboard schedules; keys embed the generation so one INCR invalidates all
+    SCHEDULE_GENERATION = 'schedule:gen'
+    STUDENT_SCHEDULE = 'schedule:student:{}:{}'  # generation, user_id
+    TEACHER_SCHEDULE = 'schedule:teacher:{}:{}'  # generation, user_id
+
     # Analytics caches
     ANALYTICS_OVERVIEW = 'analytics:overview'
     ANALYTICS_TRENDS = 'analytics:trends:{}'  # period
@@ -51,6 +61,7 @@ class CacheKeys:
 # Cache TTL configurations (in seconds)
 CACHE_TTL = {
     'user_profile': 3600,      # 1 hour
+    'user_record': 300,        # 5 minutes
     'user_permissions': 1800,  # 30 minutes
     'attendance_stats': 900,   # 15 minutes
     'attendance_records': 1800, # 30 minutes
@@ -58,6 +69,7 @@ CACHE_TTL = {
     'class_list': 1800,        # 30 minutes
     'class_details': 3600,     # 1 hour
     'course_schedule': 1800,   # 30 minutes
+    'dashboard_schedule': 600, # 10 minutes
     'analytics_overview': 600, # 10 minutes
     'analytics_trends': 1800,  # 30 minutes
     'system_config': 7200,     # 2 hours
@@ -73,6 +85,7 @@ def invalidate_user_cache(user_id):
     keys_to_delete = [
         get_cache_key(CacheKeys.USER_PROFILE, user_id),
         get_cache_key(CacheKeys.USER_PERMISSIONS, user_id),
+        get_cache_key(CacheKeys.USER_RECORD, user_id),
     ]
 
     # Also invalidate attendance caches for this user
@@ -94,6 +107,100 @@ def invalidate_user_cache(user_id):
     if keys_to_delete:
         redis_client.delete(*keys_to_delete)
 
+# Client for the read-through caches below. Resolved on first use, after
+# create_app has loaded .env; None when REDIS_URL is not configured, in which
+# case every lookup goes straight to the database
+_read_cache_client = None
+_read_cache_resolved = False
+
+def _get_read_cache():
+    """Redis client for the user and schedule caches, or None without REDIS_URL"""
+    global _read_cache_client, _read_cache_resolved
+    if not _read_cache_resolved:
+        url = os.environ.get('REDIS_URL')
+        _read_cache_client = redis.from_url(url) if url else None
+        _read_cache_resolved = True
+    return _read_cache_client
+
+# Columns kept in the cached user record; enough for views that only display a user
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'full_name', 'start_year')
+
+def get_cached_user(user_id):
+    """Return a read-only snapshot of a user, served from Redis when possible.
+
+    The snapshot exposes CACHED_USER_FIELDS plus role as a UserRole. Use
+    User.query.get for anything that modifies the user or checks passwords.
+    """
+    client = _get_read_cache()
+    key = get_cache_key(CacheKeys.USER_RECORD, user_id)
+    if client is not None:
+        try:
+            raw = client.get(key)
+            if raw:
+                data = json.loads(raw)
+                data['role'] = UserRole(data['role'])
+                return SimpleNamespace(**data)
+        except Exception as e:
+            logger.warning(f"User cache read failed: {e}")
+
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+
+    data = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+    data['role'] = user.role.value
+    if client is not None:
+        try:
+            client.setex(key, CACHE_TTL['user_record'], json.dumps(data))
+        except Exception as e:
+            logger.warning(f"User cache write failed: {e}")
+    data['role'] = user.role
+    return SimpleNamespace(**data)
+
+def forget_cached_user(user_id):
+    """Drop a user's cached snapshot after the row changes"""
+    client = _get_read_cache()
+    if client is None:
+        return
+    try:
+        client.delete(get_cache_key(CacheKeys.USER_RECORD, user_id))
+    except Exception as e:
+        logger.warning(f"User cache invalidation failed: {e}")
+
+def get_cached_schedule(key_template, user_id, build):
+    """Return a dashboard schedule from Redis, calling build() and caching it on a miss"""
+    client = _get_read_cache()
+    if client is None:
+        return build()
+
+    key = None
+    try:
+        generation = int(client.get(CacheKeys.SCHEDULE_GENERATION) or 0)
+        key = get_cache_key(key_template, generation, user_id)
+        raw = client.get(key)
+        if raw:
+            return json.loads(raw)
+    except Exception as e:
+        logger.warning(f"Schedule cache read failed: {e}")
+
+    value = build()
+    if key is not None:
+        try:
+            client.setex(key, CACHE_TTL['dashboard_schedule'], json.dumps(value))
+        except Exception as e:
+            logger.warning(f"Schedule cache write failed: {e}")
+    return value
+
+def invalidate_schedules():
+    """Invalidate every cached dashboard schedule; stale keys expire on their own"""
+    client = _get_read_cache()
+    if client is None:
+        return
+    try:
+        client.incr(CacheKeys.SCHEDULE_GENERATION)
+    except Exception as e:
+        logger.warning(f"Schedule cache invalidation failed: {e}")
+
 def invalidate_class_cache(class_id):
     """Invalidate all caches related to a specific class"""
     keys_to_delete = [
@@ -8,15 +8,18 @@ import queue
 
 from src.face_detection.yolo_detector import YOLOFaceDetector
 from src.face_recognition.matcher import FaceMatcher
-from src.models import db, AttendanceSession, AttendanceRecord, AttendanceStatus, User
+from src.models import db, AttendanceSession, AttendanceRecord, AttendanceStatus, SessionStatus, User
 from src.config import config
 
+# Minimum seconds between detection passes in the live loop
+DETECTION_INTERVAL = 0.033
+
 class AttendanceSystem:
     def __init__(self, camera_source=0):
         self.camera_source = camera_source
         self.is_running = False
-        self.frame_queue = queue.Queue(maxsize=10)
-        self.result_queue = queue.Queue(maxsize=10)
+        self.frame_queue = queue.Queue(maxsize=2)
+        self.result_queue = queue.Queue(maxsize=2)
         
         # Initialize components
         self.detector = YOLOFaceDetector(
@@ -39,17 +42,22 @@ class AttendanceSystem:
     def reload_face_database(self):
         """Reload the face recognition database"""
         db_path = config.get('recognition.database_path', 'data/face_encodings.pkl')
-        self.matcher.load_known_faces(db_path)
-        logging.info("Reloaded face recognition database")
+        if self.matcher.reload_if_changed(db_path):
+            logging.info("Reloaded face recognition database")
 
     def start_session(self, class_id: int):
         """Start a new attendance session"""
+        # The system tracks its own session id, so close any session it still
+        # owns by primary key rather than leaving two active sessions behind
+        if self.active_session_id:
+            self.stop_session()
+
         try:
             session = AttendanceSession(
                 class_id=class_id,
                 session_date=datetime.now().date(),
                 start_time=datetime.now(),
-                status='active'
+                status=SessionStatus.ACTIVE
             )
             db.session.add(session)
             db.session.commit()
@@ -59,34 +67,43 @@ class AttendanceSystem:
             return True
         except Exception as e:
             logging.error(f"Failed to start session: {e}")
+            db.session.rollback()
             return False
 
     def stop_session(self):
         """Stop the current attendance session"""
         if self.active_session_id:
             try:
-                session = AttendanceSession.query.get(self.active_session_id)
-                if session:
-                    session.end_time = datetime.now()
-                    session.status = 'completed'
-                    db.session.commit()
+                # Single UPDATE by primary key instead of select-then-mutate
+                AttendanceSession.query.filter_by(id=self.active_session_id).update(
+                    {'end_time': datetime.now(), 'status': SessionStatus.COMPLETED},
+                    synchronize_session=False
+                )
+                db.session.commit()
                 self.active_session_id = None
                 logging.info("Stopped attendance session")
             except Exception as e:
                 logging.error(f"Failed to stop session: {e}")
+                db.session.rollback()
 
     def process_frame(self, frame):
         """Process a single frame for attendance"""
         if not self.active_session_id:
             return frame
 
-        # Detect faces
-        faces = self.detector.detect_faces_with_confidence(frame)
-        
+        detections = self.analyze_frame(frame)
+        self._record_detections(detections)
+        return self.draw_detections(frame, detections)
+
+    def analyze_frame(self, frame) -> List[Tuple]:
+        """Detect and recognize faces, returning (box, student_id, name, confidence) tuples"""
+        detections = []
+        faces = self.detector.detect_faces_downscaled(frame)
+        h, w = frame.shape[:2]
+
         for (x1, y1, x2, y2, conf) in faces:
             # Extract face ROI with padding
             padding = 20
-            h, w = frame.shape[:2]
             x1_pad = max(0, x1 - padding)
             y1_pad = max(0, y1 - padding)
             x2_pad = min(w, x2 + padding)
@@ -105,18 +122,78 @@ class AttendanceSystem:
             else:
                 logging.debug("Failed to extract face encoding")
 
-            # Draw bounding box and label
+            detections.append(((x1, y1, x2, y2), student_id, name, match_conf))
+
+        return detections
+
+    def draw_detections(self, frame, detections):
+        """Draw bounding boxes and labels for detections onto the frame"""
+        for (x1, y1, x2, y2), student_id, name, match_conf in detections:
             color = (0, 255, 0) if name else (0, 0, 255)
             label = f"{name} ({match_conf:.2f})" if name else f"Unknown ({match_conf:.2f})"
 
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
             cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
+
+        return frame
+
+    def _record_detections(self, detections):
+        """Record attendance for confidently recognized detections"""
+        threshold = config.get('attendance.confidence_threshold', 0.3)
+        for _, student_id, name, match_conf in detections:
             # Record attendance if match is good and not already processed recently
-            if name and student_id and match_conf >= config.get('attendance.confidence_threshold', 0.3):
+            if name and student_id and match_conf >= threshold:
                 self._record_attendance(student_id, match_conf)
 
-        return frame
+    @staticmethod
+    def _put_latest(q: queue.Queue, item):
+        """Put item on a bounded queue, dropping the oldest entry when full"""
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                pass
+
+    def _detection_loop(self):
+        """Worker thread: run detection and recognition on the newest queued frame"""
+        while self.is_running:
+            try:
+                session_id, frame = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            started = time.monotonic()
+            try:
+                detections = self.analyze_frame(frame)
+            except Exception as e:
+                logging.error(f"Detection failed: {e}")
+                continue
+            # Tagged with the session the frame was captured under
+            self._put_latest(self.result_queue, (session_id, detections))
+
+            remaining = DETECTION_INTERVAL - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def _capture_loop(self, cap, frames: queue.Queue):
+        """Worker thread: keep only the newest camera frame in a single-slot queue"""
+        while self.is_running:
+            if not cap.grab():
+                break
+            # Frames the display loop has not asked for yet are grabbed but never decoded
+            if frames.empty():
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                self._put_latest(frames, frame)
+        # Tell the display loop the camera stopped
+        self._put_latest(frames, None)
 
     def _record_attendance(self, student_id, confidence):
         """Record attendance for a student"""
@@ -156,20 +233,56 @@ class AttendanceSystem:
         """Main loop for camera processing"""
         self.is_running = True
         cap = cv2.VideoCapture(self.camera_source)
+        # Keep the driver from queueing stale frames behind the one we render
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # Capture blocks in the driver and detection dominates the frame time,
+        # so both run off the display path; the loop below redraws the most
+        # recent results on every frame instead of waiting for them
+        frames = queue.Queue(maxsize=1)
+        capture_thread = threading.Thread(target=self._capture_loop, args=(cap, frames), daemon=True)
+        detector_thread = threading.Thread(target=self._detection_loop, daemon=True)
+        capture_thread.start()
+        detector_thread.start()
+        detections = []
         
-        while self.is_running:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            processed_frame = self.process_frame(frame)
+        try:
+            while self.is_running:
+                try:
+                    frame = frames.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                if frame is None:
+                    break
+
+                session_id = self.active_session_id
+                if session_id:
+                    self._put_latest(self.frame_queue, (session_id, frame.copy()))
+                    try:
+                        result_session_id, result = self.result_queue.get_nowait()
+                        # A frame captured before the session changed must not mark anyone present
+                        if result_session_id == session_id:
+                            detections = result
+                            # Database writes stay on this thread
+                            self._record_detections(detections)
+                        else:
+                            detections = []
+                    except queue.Empty:
+                        pass
+                else:
+                    detections = []
+
+                processed_frame = self.draw_detections(frame, detections)
             
-            # Display (optional, mostly for debug or local view)
-            cv2.imshow('Attendance System', processed_frame)
+                # Display (optional, mostly for debug or local view)
+                cv2.imshow('Attendance System', processed_frame)
             
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-                
-        cap.release()
-        cv2.destroyAllWindows()
-        self.is_running = False
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        finally:
+            # Release the device even if processing raised, so the next run can open it
+            self.is_running = False
+            capture_thread.join(timeout=1.0)
+            detector_thread.join(timeout=1.0)
+            cap.release()
+            cv2.destroyAllWindows()
@@ -12,10 +12,12 @@ class ConfigManager:
         self.config_dir = self.config_file.parent
         self.config_dir.mkdir(exist_ok=True)
         self._config = {}
+        self._cache: Dict[str, Any] = {}  # Resolved dot-separated keys
         self._load_config()
 
     def _load_config(self):
         """Load configuration from file and environment variables"""
+        self._cache = {}
         # Default configuration
         self._config = {
             "camera": {
@@ -92,17 +94,27 @@ class ConfigManager:
 
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value by dot-separated key"""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
         keys = key.split('.')
         value = self._config
         try:
             for k in keys:
                 value = value[k]
-            return value
         except KeyError:
             return default
+        self._cache[key] = value
+        return value
 
     def set(self, key: str, value: Any):
         """Set configuration value by dot-separated key"""
+        # Forget the key itself, anything below it and anything it passes through
+        self._cache = {
+            k: v for k, v in self._cache.items()
+            if k != key and not k.startswith(key + '.') and not key.startswith(k + '.')
+        }
         keys = key.split('.')
         config = self._config
         for k in keys[:-1]:
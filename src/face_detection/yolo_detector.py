@@ -4,6 +4,9 @@ import os
 from typing import List, Tuple, Optional
 import logging
 
+# Frames wider than this are shrunk before detection; boxes are mapped back
+DETECTION_MAX_WIDTH = 640
+
 class YOLOFaceDetector:
     def __init__(self, model_path: Optional[str] = None, confidence_threshold: float = 0.5):
         self.confidence_threshold = confidence_threshold
@@ -99,7 +102,41 @@ class YOLOFaceDetector:
             except Exception as e:
                 logging.error(f"YOLO detection failed: {e}")
 
-        # Fallback to Haar cascade
+        return self._detect_faces_fallback(image)
+
+    def detect_faces_batch(self, images: List[np.ndarray]) -> List[List[Tuple[int, int, int, int]]]:
+        """
+        Detect faces in several images with a single model call
+        Returns: One list of bounding boxes [(x1, y1, x2, y2), ...] per input image
+        """
+        if not images:
+            return []
+
+        batch_faces: List[List[Tuple[int, int, int, int]]] = [[] for _ in images]
+
+        # Try YOLO first; one forward pass for the whole batch
+        if self.model_available and self.model is not None:
+            try:
+                results = self.model(images, conf=self.confidence_threshold, verbose=False)
+                for i, result in enumerate(results):
+                    boxes = result.boxes
+                    if boxes is not None and len(boxes):
+                        batch_faces[i] = [
+                            (int(x1), int(y1), int(x2), int(y2))
+                            for x1, y1, x2, y2 in boxes.xyxy.cpu().numpy()
+                        ]
+            except Exception as e:
+                logging.error(f"YOLO batch detection failed: {e}")
+
+        # Same per-image fallback as detect_faces for images YOLO found nothing in
+        for i, image in enumerate(images):
+            if not batch_faces[i]:
+                batch_faces[i] = self._detect_faces_fallback(image)
+
+        return batch_faces
+
+    def _detect_faces_fallback(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """Detect faces with the Haar cascade fallback"""
         if self.fallback_detector is not None:
             try:
                 gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -164,6 +201,23 @@ class YOLOFaceDetector:
         logging.warning("No face detection method available")
         return []
     
+    def detect_faces_downscaled(self, image: np.ndarray,
+                                max_width: int = DETECTION_MAX_WIDTH) -> List[Tuple[int, int, int, int, float]]:
+        """
+        detect_faces_with_confidence on a copy at most max_width wide
+        Returns: Boxes in the coordinates of the original image
+        """
+        h, w = image.shape[:2]
+        if w <= max_width:
+            return self.detect_faces_with_confidence(image)
+
+        scale = max_width / w
+        small = cv2.resize(image, (max_width, max(1, int(h * scale))), interpolation=cv2.INTER_LINEAR)
+        return [
+            (int(x1 / scale), int(y1 / scale), int(x2 / scale), int(y2 / scale), conf)
+            for (x1, y1, x2, y2, conf) in self.detect_faces_with_confidence(small)
+        ]
+
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """Preprocess image for better detection"""
         if len(image.shape) == 3:
@@ -1,7 +1,10 @@
 import cv2
 import numpy as np
 import pickle
+import json
 import os
+import glob
+import uuid
 from typing import List, Tuple, Optional, Dict, Any
 import logging
 from sklearn.metrics.pairwise import cosine_similarity
@@ -15,6 +18,18 @@ except ImportError:
     FACE_RECOGNITION_AVAILABLE = False
     logging.warning("face_recognition not available. Using basic features only.")
 
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    faiss = None
+    FAISS_AVAILABLE = False
+
+# Below this many 128-d faces one brute-force matmul beats searching an HNSW graph
+ANN_MIN_FACES = 1000
+# HNSW search breadth; FAISS defaults to 16, too low a recall for identity matching
+ANN_EF_SEARCH = 64
+
 class FaceMatcher:
     def __init__(self, tolerance: float = 0.4, confidence_threshold: float = 0.6):
         self.tolerance = tolerance
@@ -23,17 +38,24 @@ class FaceMatcher:
         self.known_face_ids = []
         self.known_face_names = []
         self.known_face_metadata = []  # Store additional metadata
+        # Snapshot of the known faces for matching, rebuilt when the lists change:
+        # (stamp, per-dimension matrices, FAISS HNSW index or None, encodings, ids, names).
+        # Published with a single assignment so a concurrent recognize_face never
+        # pairs matrices or an index with row indices from a different build
+        self._known_state = None
+        self._loaded_store = None  # (database_path, file stamps) of the last successful load
 
         logging.info(f"Face Matcher initialized with tolerance: {tolerance}, confidence_threshold: {confidence_threshold}")
 
-    def validate_face_quality(self, face_image: np.ndarray) -> Dict[str, Any]:
+    def validate_face_quality(self, face_image: np.ndarray,
+                              face_location: Optional[Tuple[int, int, int, int]] = None) -> Dict[str, Any]:
         """Validate face image quality for recognition"""
         quality_metrics = {
             'brightness': self._check_brightness(face_image),
             'focus': self._check_focus(face_image),
             'angle': self._check_face_angle(face_image),
             'size': self._check_face_size(face_image),
-            'pose': self._check_face_pose(face_image),
+            'pose': self._check_face_pose(face_image, face_location),
             'overall_score': 0.0
         }
 
@@ -107,7 +129,8 @@ class FaceMatcher:
         except:
             return 0.5
 
-    def _check_face_pose(self, face_image: np.ndarray) -> float:
+    def _check_face_pose(self, face_image: np.ndarray,
+                         face_location: Optional[Tuple[int, int, int, int]] = None) -> float:
         """Check face pose using facial landmarks (0-1, higher is better)"""
         try:
             if not FACE_RECOGNITION_AVAILABLE:
@@ -118,7 +141,8 @@ class FaceMatcher:
 
             # Get face landmarks
             try:
-                face_landmarks_list = face_recognition.face_landmarks(rgb_image)  # type: ignore
+                face_landmarks_list = face_recognition.face_landmarks(  # type: ignore
+                    rgb_image, face_locations=[face_location] if face_location else None)
             except AttributeError:
                 return 0.5  # Fallback if landmarks not available
 
@@ -151,44 +175,156 @@ class FaceMatcher:
             logging.error(f"Error checking face pose: {e}")
             return 0.5
 
-    def load_known_faces(self, database_path: str):
+    @staticmethod
+    def _array_store_paths(database_path: str) -> Tuple[str, str]:
+        """Stem of the versioned float32 .npy matrices and path of the JSON sidecar"""
+        stem = os.path.splitext(database_path)[0]
+        return stem, stem + '.json'
+
+    def _store_stamp(self, database_path: str) -> Tuple:
+        """Modification times of the files currently backing a database path"""
+        stamp = []
+        # The sidecar names the matrix it belongs to, so its mtime covers both
+        for path in (database_path, self._array_store_paths(database_path)[1]):
+            try:
+                stamp.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                pass
+        return tuple(stamp)
+
+    def reload_if_changed(self, database_path: str) -> bool:
+        """Reload the database only if its files changed since the last load"""
+        if self._loaded_store == (database_path, self._store_stamp(database_path)):
+            return False
+        # A refused load leaves _loaded_store stale, so the next call retries
+        return self.load_known_faces(database_path)
+
+    def _read_array_store(self, database_path: str) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Read the sidecar and the matrix it names, checking they describe the same faces"""
+        stem, sidecar_path = self._array_store_paths(database_path)
+        for attempt in range(3):
+            with open(sidecar_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            matrix_path = os.path.join(os.path.dirname(sidecar_path), data.get('matrix', os.path.basename(stem) + '.npy'))
+            try:
+                # Rows stay memory-mapped until a matcher first touches them
+                matrix = np.load(matrix_path, mmap_mode='r')
+                break
+            except FileNotFoundError:
+                # A concurrent save replaced the sidecar and removed this matrix; read the new pair
+                if attempt == 2:
+                    raise
+        counts = {len(matrix), len(data.get('ids', [])), len(data.get('names', []))}
+        if len(counts) != 1 or data.get('count', len(matrix)) != len(matrix):
+            raise ValueError(f"Face database {sidecar_path} does not match its matrix {matrix_path}")
+        return matrix, data
+
+    def load_known_faces(self, database_path: str) -> bool:
         """Load known face encodings from database"""
         try:
-            if os.path.exists(database_path):
+            stem, sidecar_path = self._array_store_paths(database_path)
+            if os.path.exists(sidecar_path):
+                matrix, data = self._read_array_store(database_path)
+                self.known_face_encodings = list(matrix)
+                self.known_face_ids = data.get('ids', [])
+                self.known_face_names = data.get('names', [])
+                self.known_face_metadata = data.get('metadata', [])
+                self._known_state = None
+                logging.info(f"Loaded {len(self.known_face_encodings)} known faces")
+            elif os.path.exists(database_path):
                 with open(database_path, 'rb') as f:
                     data = pickle.load(f)
                     self.known_face_encodings = data.get('encodings', [])
                     self.known_face_ids = data.get('ids', [])
                     self.known_face_names = data.get('names', [])
                     self.known_face_metadata = data.get('metadata', [])
+                self._known_state = None
                 logging.info(f"Loaded {len(self.known_face_encodings)} known faces")
+                # Migrate a legacy pickle to the array format
+                self.save_known_faces(database_path)
             else:
+                self._loaded_store = None
                 logging.warning(f"Database file not found: {database_path}")
+                return False
+            self._loaded_store = (database_path, self._store_stamp(database_path))
+            return True
         except Exception as e:
             logging.error(f"Error loading face database: {e}")
+            return False
     
     def save_known_faces(self, database_path: str):
         """Save known face encodings to database"""
         try:
             os.makedirs(os.path.dirname(database_path), exist_ok=True)
-            data = {
-                'encodings': self.known_face_encodings,
-                'ids': self.known_face_ids,
-                'names': self.known_face_names,
-                'metadata': self.known_face_metadata
-            }
-            with open(database_path, 'wb') as f:
-                pickle.dump(data, f)
+            stem, sidecar_path = self._array_store_paths(database_path)
+            # Each save writes a new matrix file; the sidecar names it and is swapped in last,
+            # so a concurrent reader sees either the old pair or the new one, never a mix
+            matrix_path = f"{stem}.{uuid.uuid4().hex}.npy"
+
+            # One encoder dimension and JSON-friendly lists: a float32 matrix plus a JSON sidecar
+            sidecar = None
+            if len({len(encoding) for encoding in self.known_face_encodings}) <= 1:
+                try:
+                    sidecar = json.dumps({
+                        'matrix': os.path.basename(matrix_path),
+                        'count': len(self.known_face_encodings),
+                        'ids': self.known_face_ids,
+                        'names': self.known_face_names,
+                        'metadata': self.known_face_metadata
+                    })
+                except TypeError:
+                    pass
+
+            # Earlier versioned matrices, plus a bare <stem>.npy from before versioning
+            old_matrices = glob.glob(glob.escape(stem) + '.*npy')
+            if sidecar is not None:
+                matrix = np.asarray(self.known_face_encodings, dtype=np.float32)
+                with open(matrix_path, 'wb') as f:
+                    np.save(f, matrix)
+                with open(sidecar_path + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(sidecar)
+                os.replace(sidecar_path + '.tmp', sidecar_path)
+                stale_paths = old_matrices
+                if database_path != sidecar_path:
+                    stale_paths.append(database_path)
+            else:
+                data = {
+                    'encodings': self.known_face_encodings,
+                    'ids': self.known_face_ids,
+                    'names': self.known_face_names,
+                    'metadata': self.known_face_metadata
+                }
+                with open(database_path, 'wb') as f:
+                    pickle.dump(data, f)
+                stale_paths = [path for path in (sidecar_path, *old_matrices) if path != database_path]
+
+            # Drop the other format so loading never picks up an outdated copy
+            for stale_path in stale_paths:
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
             logging.info(f"Saved {len(self.known_face_encodings)} known faces")
         except Exception as e:
             logging.error(f"Error saving face database: {e}")
     
-    def extract_face_features(self, face_image: np.ndarray) -> Optional[np.ndarray]:
-        """Extract face features from face image"""
+    def locate_face(self, face_image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Return the (top, right, bottom, left) box of the face the encoder would use"""
+        if not FACE_RECOGNITION_AVAILABLE or face_recognition is None:
+            return None
+        try:
+            rgb_image = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
+            locations = face_recognition.face_locations(rgb_image)
+            return locations[0] if locations else None
+        except Exception as e:
+            logging.error(f"Error locating face: {e}")
+            return None
+
+    def extract_face_features(self, face_image: np.ndarray,
+                              face_location: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+        """Extract face features from face image; a known face_location skips detection"""
         try:
             # Validate face quality first (only if face_recognition is available)
             if FACE_RECOGNITION_AVAILABLE and face_recognition is not None:
-                quality = self.validate_face_quality(face_image)
+                quality = self.validate_face_quality(face_image, face_location)
                 if quality['overall_score'] < 0.1:  # Lower threshold
                     logging.warning(f"Poor face quality detected: {quality}")
                     return None
@@ -196,7 +332,8 @@ class FaceMatcher:
                 # Use face_recognition library if available (128-d vector)
                 # Convert BGR to RGB
                 rgb_image = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
-                encodings = face_recognition.face_encodings(rgb_image)
+                encodings = face_recognition.face_encodings(
+                    rgb_image, known_face_locations=[face_location] if face_location else None)
                 if encodings:
                     return encodings[0]
 
@@ -233,6 +370,48 @@ class FaceMatcher:
             logging.error(f"Error extracting HOG features: {e}")
             return None
     
+    def _get_known_state(self) -> Tuple:
+        """Return the current matching snapshot, rebuilding it if the known faces changed"""
+        encodings = self.known_face_encodings
+        stamp = (id(encodings), len(encodings))
+        state = self._known_state
+        if state is None or state[0] != stamp:
+            groups: Dict[int, List[int]] = {}
+            for i, known_encoding in enumerate(encodings):
+                groups.setdefault(len(known_encoding), []).append(i)
+
+            matrices = {}
+            for group_dim, indices in groups.items():
+                # float32 halves the bytes each scan streams through
+                matrix = np.array([encodings[i] for i in indices], dtype=np.float32)
+                if group_dim != 128:
+                    # Cosine similarity becomes a plain dot product on unit rows
+                    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                    norms[norms == 0] = 1.0
+                    matrix /= norms
+                sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+                matrices[group_dim] = (np.asarray(indices), matrix, sq_norms)
+
+            # Build everything first, then publish it in one assignment
+            ann_index = self._build_ann_index(matrices.get(128))
+            state = (stamp, matrices, ann_index, encodings, self.known_face_ids, self.known_face_names)
+            self._known_state = state
+        return state
+
+    @staticmethod
+    def _build_ann_index(entry):
+        """HNSW index over the dlib encodings when FAISS is installed and the set is large"""
+        if not FAISS_AVAILABLE or entry is None or len(entry[0]) < ANN_MIN_FACES:
+            return None
+        try:
+            index = faiss.IndexHNSWFlat(128, 32)
+            index.hnsw.efSearch = ANN_EF_SEARCH
+            index.add(entry[1])
+            return index
+        except Exception as e:
+            logging.error(f"Error building FAISS index: {e}")
+            return None
+
     def recognize_face(self, face_encoding: np.ndarray) -> Tuple[Optional[str], Optional[str], float]:
         """
         Recognize face from encoding
@@ -247,28 +426,48 @@ class FaceMatcher:
         try:
             # Check encoding type based on dimension
             is_dlib_encoding = len(face_encoding) == 128
-            
-            similarities = []
-            for i, known_encoding in enumerate(self.known_face_encodings):
-                # Only compare encodings of the same dimension
-                if len(face_encoding) == len(known_encoding):
-                    if is_dlib_encoding:
-                        # For dlib (128-d), use Euclidean distance (lower is better)
-                        # We convert it to a similarity score (0-1)
-                        distance = np.linalg.norm(face_encoding - known_encoding)
-                        # Typical threshold is 0.6. Convert to similarity: 1 - (dist/threshold) or similar
-                        # Let's use a simple inversion: 1 / (1 + distance)
-                        # Distance 0 -> Sim 1.0
-                        # Distance 0.6 -> Sim 0.625
-                        similarity = 1.0 / (1.0 + distance)
-                        similarities.append((i, similarity))
+
+            # Everything below reads one snapshot, even if the faces are reloaded meanwhile
+            _, matrices, ann_index, known_encodings, known_ids, known_names = self._get_known_state()
+
+            # Only compare encodings of the same dimension
+            entry = matrices.get(len(face_encoding))
+            if entry is not None:
+                indices, matrix, sq_norms = entry
+                probe = np.asarray(face_encoding, dtype=np.float32)
+                if is_dlib_encoding and ann_index is not None:
+                    # Approximate nearest neighbour; the index reports squared L2 distance
+                    sq_distances, neighbours = ann_index.search(probe[None, :], 1)
+                    best = max(int(neighbours[0, 0]), 0)
+                    best_sq_distance = float(sq_distances[0, 0]) if neighbours[0, 0] >= 0 else np.inf
+                    max_similarity = 1.0 / (1.0 + np.sqrt(max(best_sq_distance, 0.0)))
+                elif is_dlib_encoding:
+                    # For dlib (128-d), use Euclidean distance (lower is better),
+                    # expanded as |k|^2 - 2k.p + |p|^2 so all rows cost one matmul.
+                    # The similarity is monotonic in distance, so only the
+                    # nearest row is converted: 1 / (1 + distance)
+                    # Distance 0 -> Sim 1.0
+                    # Distance 0.6 -> Sim 0.625
+                    sq_distances = sq_norms - 2.0 * (matrix @ probe)
+                    best = int(sq_distances.argmin())
+                    # Score the winner exactly, in double precision
+                    distance = np.linalg.norm(
+                        np.asarray(known_encodings[indices[best]], dtype=np.float64)
+                        - np.asarray(face_encoding, dtype=np.float64))
+                    max_similarity = 1.0 / (1.0 + distance)
+                else:
+                    # For ResNet (512-d), use Cosine Similarity (higher is better);
+                    # rows are stored unit-normalized
+                    probe_norm = np.linalg.norm(probe)
+                    if probe_norm > 0:
+                        similarities = matrix @ (probe / probe_norm)
+                        best = int(similarities.argmax())
+                        max_similarity = float(similarities[best])
                     else:
-                        # For ResNet (512-d), use Cosine Similarity (higher is better)
-                        similarity = cosine_similarity([face_encoding], [known_encoding])[0][0]
-                        similarities.append((i, similarity))
+                        best, max_similarity = 0, 0.0
 
-            if similarities:
-                best_match_index, max_similarity = max(similarities, key=lambda x: x[1])
+                best_match_index = int(indices[best])
+                max_similarity = float(max_similarity)
 
                 # Dynamic threshold based on method
                 if is_dlib_encoding:
@@ -279,8 +478,8 @@ class FaceMatcher:
                     threshold = 0.30  # Lowered for HOG features
 
                 if max_similarity >= threshold:
-                    student_id = self.known_face_ids[best_match_index]
-                    student_name = self.known_face_names[best_match_index]
+                    student_id = known_ids[best_match_index]
+                    student_name = known_names[best_match_index]
                     logging.info(f"Face recognized: {student_name} ({student_id}) with similarity {max_similarity:.3f}")
                     return student_id, student_name, max_similarity
                 else:
@@ -307,6 +506,31 @@ class FaceMatcher:
             logging.error(f"Failed to extract encoding for {student_name}")
             return False
     
+    def add_known_faces(self, face_images: List[np.ndarray], student_id: str, student_name: str,
+                        metadata: Dict[str, Any] = None,
+                        face_locations: Optional[List[Optional[Tuple[int, int, int, int]]]] = None) -> int:
+        """Add several images of one person; returns how many were encoded.
+
+        face_locations, aligned with face_images, lets callers reuse a face box
+        they already know (e.g. for augmented copies) instead of detecting again.
+        """
+        if face_locations is None:
+            face_locations = [None] * len(face_images)
+
+        added = 0
+        for face_image, face_location in zip(face_images, face_locations):
+            face_encoding = self.extract_face_features(face_image, face_location)
+            if face_encoding is None:
+                continue
+            self.known_face_encodings.append(face_encoding)
+            self.known_face_ids.append(student_id)
+            self.known_face_names.append(student_name)
+            self.known_face_metadata.append(dict(metadata or {}))
+            added += 1
+
+        logging.info(f"Added {added}/{len(face_images)} faces for {student_name} ({student_id})")
+        return added
+
     def batch_recognize_faces(self, face_encodings: List[np.ndarray]) -> List[Tuple[Optional[str], Optional[str], float]]:
         """Recognize multiple faces at once"""
         results = []
@@ -2,13 +2,52 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, DECIMAL, JSON, Enum, Date, Time, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from werkzeug.security import generate_password_hash, check_password_hash
 import enum
+import logging
+import os
+import secrets
+import time
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+    ARGON2_AVAILABLE = True
+except ImportError:
+    PasswordHasher = None
+    ARGON2_AVAILABLE = False
 
 db = SQLAlchemy()
 
+# Shared Argon2id hasher, created on first use by _get_password_hasher
+_password_hasher = None
+# Hashing slower than this makes every login a noticeable CPU hog
+PASSWORD_HASH_WARN_SECONDS = 0.4
+# Hash of a random password, created on first use by User.check_dummy_password
+_dummy_password_hash = None
+
+def _get_password_hasher():
+    """Shared Argon2id hasher, tuned for roughly 50ms per hash on a single core.
+
+    ARGON2_TIME_COST and ARGON2_MEMORY_COST (KiB) override the cost per host.
+    They are read on first use rather than at import, so values from .env
+    (loaded in create_app) apply. Returns None without argon2-cffi.
+    """
+    global _password_hasher
+    if _password_hasher is None and ARGON2_AVAILABLE:
+        _password_hasher = PasswordHasher(
+            time_cost=int(os.environ.get('ARGON2_TIME_COST', 2)),
+            memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 19456)),
+            parallelism=1
+        )
+    return _password_hasher
+
+# JSON everywhere, JSONB on PostgreSQL so the columns can carry GIN indexes
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
 class UserRole(enum.Enum):
     STUDENT = 'student'
     TEACHER = 'teacher'
@@ -40,7 +79,7 @@ class User(db.Model):
     major = Column(String(100))  # For students
     degree_level = Column(String(20))  # Bachelor's, Master's, PhD
     start_year = Column(String(4))   # Year student started (e.g., '2023')
-    courses = Column(JSON)       # For teachers, list of course names
+    courses = Column(JSONType)   # For teachers, list of course names
     created_at = Column(DateTime, default=func.now())
 
     # Relationships
@@ -55,10 +94,71 @@ class User(db.Model):
     )
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        password_hasher = _get_password_hasher()
+        if password_hasher is not None:
+            self.password_hash = password_hasher.hash(password)
+        else:
+            self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
-        return check_password_hash(str(self.password_hash), password)
+        """Verify a password; legacy or outdated hashes are upgraded in place.
+
+        A rehash only changes the instance, so callers that want it persisted
+        must commit the session.
+        """
+        stored = str(self.password_hash)
+        password_hasher = _get_password_hasher()
+        if password_hasher is None:
+            return check_password_hash(stored, password)
+
+        if stored.startswith('$argon2'):
+            try:
+                password_hasher.verify(stored, password)
+            except (VerificationError, InvalidHashError):
+                return False
+            if password_hasher.check_needs_rehash(stored):
+                self.set_password(password)
+            return True
+
+        # Werkzeug pbkdf2/scrypt hash from before the Argon2 switch
+        if check_password_hash(stored, password):
+            self.set_password(password)
+            return True
+        return False
+
+    @staticmethod
+    def check_dummy_password(password):
+        """Spend the same hashing time as check_password when no user matched.
+
+        Keeps failed logins for unknown accounts from being distinguishable by
+        response time. Always returns False.
+        """
+        global _dummy_password_hash
+        if _dummy_password_hash is None:
+            dummy = User()
+            dummy.set_password(secrets.token_urlsafe(16))
+            _dummy_password_hash = dummy.password_hash
+        password_hasher = _get_password_hasher()
+        if password_hasher is not None:
+            try:
+                password_hasher.verify(_dummy_password_hash, password or '')
+            except (VerificationError, InvalidHashError):
+                pass
+        else:
+            check_password_hash(_dummy_password_hash, password or '')
+        return False
+
+def check_password_hash_cost():
+    """Time one password hash and warn if the configured cost is too slow here"""
+    start = time.perf_counter()
+    User().set_password(secrets.token_urlsafe(16))
+    elapsed = time.perf_counter() - start
+    if elapsed > PASSWORD_HASH_WARN_SECONDS:
+        logging.warning(
+            f"Password hashing took {elapsed * 1000:.0f}ms; consider lowering "
+            f"ARGON2_TIME_COST/ARGON2_MEMORY_COST"
+        )
+    return elapsed
 
 class Class(db.Model):
     __tablename__ = 'classes'
@@ -169,7 +269,7 @@ class AttendanceRecord(db.Model):
     detected_at = Column(DateTime)
     confidence_score = Column(DECIMAL(3, 2))
     liveness_score = Column(DECIMAL(3, 2))
-    fraud_flags = Column(JSON)  # Store fraud detection results
+    fraud_flags = Column(JSONType)  # Store fraud detection results
     manual_override = Column(Boolean, default=False, nullable=False)
     override_by = Column(Integer, ForeignKey('users.id'))
     override_reason = Column(Text)
@@ -186,6 +286,7 @@ class AttendanceRecord(db.Model):
         db.Index('idx_record_session_student', 'session_id', 'student_id'),
         db.Index('idx_record_status', 'status'),
         db.Index('idx_record_detected_at', 'detected_at'),
+        db.Index('idx_record_fraud_flags', 'fraud_flags', postgresql_using='gin').ddl_if(dialect='postgresql'),
     )
 
 class FaceEncoding(db.Model):
@@ -261,7 +362,7 @@ class SystemLog(db.Model):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     action = Column(String(100), nullable=False)
-    details = Column(JSON)
+    details = Column(JSONType)
     timestamp = Column(DateTime, default=func.now(), nullable=False)
 
     # Relationships
@@ -271,4 +372,5 @@ class SystemLog(db.Model):
         db.Index('idx_log_user_timestamp', 'user_id', 'timestamp'),
         db.Index('idx_log_action', 'action'),
         db.Index('idx_log_timestamp', 'timestamp'),
+        db.Index('idx_log_details', 'details', postgresql_using='gin').ddl_if(dialect='postgresql'),
     )
\ No newline at end of file
@@ -10,58 +10,90 @@ import numpy as np
 class PerformanceMonitor:
     """Monitor system performance metrics"""
 
-    def __init__(self, max_samples: int = 100):
+    def __init__(self, max_samples: int = 100, system_sample_interval: float = 1.0):
         self.max_samples = max_samples
+        self.system_sample_interval = system_sample_interval
         self.frame_times = deque(maxlen=max_samples)
         self.detection_times = deque(maxlen=max_samples)
         self.recognition_times = deque(maxlen=max_samples)
         self.memory_usage = deque(maxlen=max_samples)
         self.cpu_usage = deque(maxlen=max_samples)
 
-        self.start_time = time.time()
+        # Running totals kept alongside each deque so averages are O(1)
+        self._sums = {
+            'frame': 0.0,
+            'detection': 0.0,
+            'recognition': 0.0,
+            'memory': 0.0,
+            'cpu': 0.0,
+        }
+
+        self.start_time = time.monotonic()
         self.frame_count = 0
 
+        # Reuse one Process handle; sample it at most once per interval
+        self._process = None
+        self._last_system_sample = 0.0
+
+    def _push(self, samples: deque, key: str, value: float):
+        """Append a sample and update the running sum, accounting for eviction"""
+        if len(samples) == samples.maxlen:
+            self._sums[key] -= samples[0]
+        samples.append(value)
+        self._sums[key] += value
+
+    def _mean(self, samples: deque, key: str) -> float:
+        """Average of a sample window using its running sum"""
+        return self._sums[key] / len(samples) if samples else 0
+
     def record_frame_time(self, duration: float):
         """Record frame processing time"""
-        self.frame_times.append(duration)
+        self._push(self.frame_times, 'frame', duration)
         self.frame_count += 1
 
     def record_detection_time(self, duration: float):
         """Record face detection time"""
-        self.detection_times.append(duration)
+        self._push(self.detection_times, 'detection', duration)
 
     def record_recognition_time(self, duration: float):
         """Record face recognition time"""
-        self.recognition_times.append(duration)
+        self._push(self.recognition_times, 'recognition', duration)
 
     def record_system_metrics(self):
         """Record system resource usage"""
+        now = time.monotonic()
+        if now - self._last_system_sample < self.system_sample_interval:
+            return
+        self._last_system_sample = now
+
         try:
-            process = psutil.Process(os.getpid())
-            self.memory_usage.append(process.memory_info().rss / 1024 / 1024)  # MB
-            self.cpu_usage.append(process.cpu_percent())
+            if self._process is None:
+                self._process = psutil.Process(os.getpid())
+            process = self._process
+            self._push(self.memory_usage, 'memory', process.memory_info().rss / 1024 / 1024)  # MB
+            self._push(self.cpu_usage, 'cpu', process.cpu_percent())
         except Exception as e:
             logging.debug(f"Failed to record system metrics: {e}")
 
     def get_fps(self) -> float:
         """Calculate current FPS"""
-        if not self.frame_times:
+        if not self.frame_times or self._sums['frame'] <= 0:
             return 0.0
-        return 1.0 / (sum(self.frame_times) / len(self.frame_times))
+        return 1.0 / self._mean(self.frame_times, 'frame')
 
     def get_average_times(self) -> Dict[str, float]:
         """Get average processing times"""
         return {
-            'frame_time': sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0,
-            'detection_time': sum(self.detection_times) / len(self.detection_times) if self.detection_times else 0,
-            'recognition_time': sum(self.recognition_times) / len(self.recognition_times) if self.recognition_times else 0,
+            'frame_time': self._mean(self.frame_times, 'frame'),
+            'detection_time': self._mean(self.detection_times, 'detection'),
+            'recognition_time': self._mean(self.recognition_times, 'recognition'),
         }
 
     def get_system_metrics(self) -> Dict[str, float]:
         """Get system resource metrics"""
         return {
-            'memory_mb': sum(self.memory_usage) / len(self.memory_usage) if self.memory_usage else 0,
-            'cpu_percent': sum(self.cpu_usage) / len(self.cpu_usage) if self.cpu_usage else 0,
+            'memory_mb': self._mean(self.memory_usage, 'memory'),
+            'cpu_percent': self._mean(self.cpu_usage, 'cpu'),
         }
 
     def get_stats(self) -> Dict:
@@ -69,7 +101,7 @@ class PerformanceMonitor:
         return {
             'fps': self.get_fps(),
             'total_frames': self.frame_count,
-            'uptime_seconds': time.time() - self.start_time,
+            'uptime_seconds': time.monotonic() - self.start_time,
             'averages': self.get_average_times(),
             'system': self.get_system_metrics(),
         }
@@ -140,20 +172,34 @@ class OptimizedFaceMatcher:
 
 
 class AsyncProcessor:
-    """Asynchronous processing for better performance"""
+    """Asynchronous processing for better performance
+
+    ``mode='thread'`` suits work that releases the GIL (OpenCV, numpy, torch);
+    ``mode='process'`` runs pure-Python CPU-bound work in worker processes.
+    Tasks submitted in process mode must be picklable module-level callables.
+    """
+
+    MODES = ('thread', 'process')
 
-    def __init__(self, max_workers: int = 2):
-        self.max_workers = max_workers
+    def __init__(self, max_workers: Optional[int] = 2, mode: str = 'thread'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
         self.executor = None
         self._init_executor()
 
     def _init_executor(self):
-        """Initialize thread pool executor"""
+        """Initialize thread or process pool executor"""
         try:
-            from concurrent.futures import ThreadPoolExecutor
-            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
-        except ImportError:
-            logging.warning("ThreadPoolExecutor not available, falling back to synchronous processing")
+            if self.mode == 'process':
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        except (ImportError, NotImplementedError, OSError) as e:
+            logging.warning(f"{self.mode} pool not available ({e}), falling back to synchronous processing")
             self.executor = None
 
     def submit_task(self, func: Callable, *args, **kwargs):
@@ -162,7 +208,10 @@ class AsyncProcessor:
             return self.executor.submit(func, *args, **kwargs)
         else:
             # Synchronous fallback
-            return SynchronousFuture(func(*args, **kwargs))
+            try:
+                return SynchronousFuture(func(*args, **kwargs))
+            except Exception as e:
+                return SynchronousFuture(exception=e)
 
     def shutdown(self):
         """Shutdown the executor"""
@@ -171,17 +220,38 @@ class AsyncProcessor:
 
 
 class SynchronousFuture:
-    """Synchronous future for fallback when threading is not available"""
+    """Synchronous future for fallback when threading is not available
 
-    def __init__(self, result):
-        self.result = result
-        self._done = True
+    Mirrors the parts of ``concurrent.futures.Future`` callers rely on, so the
+    fallback path can be used interchangeably with a real executor future.
+    """
+
+    def __init__(self, result=None, exception: Optional[BaseException] = None):
+        self._result = result
+        self._exception = exception
 
     def done(self):
-        return self._done
+        return True
+
+    def running(self):
+        return False
+
+    def cancelled(self):
+        return False
+
+    def cancel(self):
+        return False
 
     def result(self, timeout=None):
-        return self.result
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        return self._exception
+
+    def add_done_callback(self, fn: Callable):
+        fn(self)
 
 
 class ResourceManager:
@@ -193,6 +263,11 @@ class ResourceManager:
 
     def get_resource(self, name: str, factory: Callable):
         """Get or create a resource"""
+        # Fast path: dict reads are atomic, only creation needs the lock
+        resource = self.resources.get(name)
+        if resource is not None:
+            return resource
+
         with self.lock:
             if name not in self.resources:
                 self.resources[name] = factory()
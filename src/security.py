@@ -3,12 +3,48 @@ import re
 import logging
 from typing import Optional, Tuple, Dict, Any
 from pathlib import Path
+import calendar
+import functools
 import hashlib
 import shutil
 import secrets
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify, session
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+# Characters stripped from user-supplied filenames
+_FILENAME_DEL_TABLE = str.maketrans('', '', '<>:"/\\|?*')
+
+# Shared zero buffer for overwriting files before deletion
+_ZERO_CHUNK = bytes(1 << 20)
+
+# Supported image signatures keyed by prefix length, checked longest first
+_IMAGE_SIGNATURES = {
+    8: {b'\x89PNG\r\n\x1a\n': 'PNG'},
+    6: {b'GIF87a': 'GIF', b'GIF89a': 'GIF'},
+    3: {b'\xff\xd8\xff': 'JPEG'},
+    2: {b'BM': 'BMP'},
+}
+
+
+def _iter_files(root):
+    """Recursively yield DirEntry objects for regular files under root
+
+    os.scandir carries the file type from readdir, so no extra stat per entry
+    is needed to tell files from directories.
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
 
 class InputValidator:
     """Validate and sanitize user inputs"""
@@ -17,10 +53,12 @@ class InputValidator:
     STUDENT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,20}$')
 
     # Name pattern: letters, spaces, hyphens, apostrophes, max 50 chars
-    NAME_PATTERN = re.compile(r"^[A-Za-z\s\-']{1,50}$")
+    NAME_PATTERN = re.compile(r"\A[A-Za-z\s\-']{1,50}\Z")
 
-    # Email pattern (basic validation)
-    EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    # Email parts (basic validation), matched separately after splitting on '@'
+    EMAIL_LOCAL_PATTERN = re.compile(r'\A[A-Za-z0-9._%+\-]{1,64}\Z')
+    EMAIL_DOMAIN_PATTERN = re.compile(r'\A[A-Za-z0-9.\-]{1,253}\.[A-Za-z]{2,}\Z')
+    MAX_EMAIL_LENGTH = 254
 
     @staticmethod
     def validate_student_id(student_id: str) -> Tuple[bool, str]:
@@ -49,7 +87,7 @@ class InputValidator:
         if not name:
             return False, "Student name cannot be only whitespace"
 
-        if not InputValidator.NAME_PATTERN.match(name):
+        if len(name) > 50 or not InputValidator.NAME_PATTERN.match(name):
             return False, "Student name contains invalid characters or is too long"
 
         return True, ""
@@ -63,7 +101,13 @@ class InputValidator:
         if not isinstance(email, str):
             return False, "Email must be a string"
 
-        if not InputValidator.EMAIL_PATTERN.match(email):
+        # Cheap structural checks first so pathological input never reaches the regexes
+        if len(email) > InputValidator.MAX_EMAIL_LENGTH or email.count('@') != 1:
+            return False, "Invalid email format"
+
+        local, domain = email.split('@', 1)
+        if not (InputValidator.EMAIL_LOCAL_PATTERN.match(local)
+                and InputValidator.EMAIL_DOMAIN_PATTERN.match(domain)):
             return False, "Invalid email format"
 
         return True, ""
@@ -72,9 +116,7 @@ class InputValidator:
     def sanitize_filename(filename: str) -> str:
         """Sanitize filename to prevent path traversal and other issues"""
         # Remove path separators and other dangerous characters
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-        filename = filename.replace('..', '')
-        return filename.strip()
+        return filename.translate(_FILENAME_DEL_TABLE).replace('..', '').strip()
 
     @staticmethod
     def validate_image_data(image_data: bytes, max_size: int = 10*1024*1024) -> Tuple[bool, str]:
@@ -90,16 +132,8 @@ class InputValidator:
             return False, "Image data too small"
 
         # Check common image headers
-        headers = {
-            b'\xff\xd8\xff': 'JPEG',
-            b'\x89PNG\r\n\x1a\n': 'PNG',
-            b'GIF87a': 'GIF',
-            b'GIF89a': 'GIF',
-            b'BM': 'BMP'
-        }
-
-        for header, format_name in headers.items():
-            if image_data.startswith(header):
+        for length, signatures in _IMAGE_SIGNATURES.items():
+            if image_data[:length] in signatures:
                 return True, ""
 
         return False, "Unsupported image format"
@@ -110,44 +144,62 @@ class SecureFileHandler:
 
     ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
     MAX_FILENAME_LENGTH = 255
+    MAX_READ_SIZE = 50 * 1024 * 1024  # 50MB
 
     def __init__(self, base_dir: str):
         self.base_dir = Path(base_dir).resolve()
         self.base_dir.mkdir(exist_ok=True)
+        # Cached once; also the key for the shared secure_path cache
+        self._base_dir_str = str(self.base_dir)
 
     def secure_path(self, filename: str, subdir: str = "") -> Tuple[bool, Path]:
         """Create a secure file path"""
         try:
-            # Sanitize filename
-            filename = InputValidator.sanitize_filename(filename)
-
-            if not filename:
-                return False, Path()
+            success, full_path_str = self._secure_path_cached(self._base_dir_str, filename, subdir)
+            return success, Path(full_path_str) if success else Path()
 
-            if len(filename) > self.MAX_FILENAME_LENGTH:
-                return False, Path()
+        except Exception as e:
+            logging.error(f"Error creating secure path: {e}")
+            return False, Path()
 
-            # Check extension
-            ext = Path(filename).suffix.lower()
-            if ext not in self.ALLOWED_EXTENSIONS:
-                return False, Path()
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _secure_path_cached(base_str: str, filename: str, subdir: str) -> Tuple[bool, str]:
+        """Sanitize and place a filename under base_str; pure, so results are memoized"""
+        # Sanitize filename
+        filename = InputValidator.sanitize_filename(filename)
+
+        if not filename:
+            return False, ''
+
+        if len(filename) > SecureFileHandler.MAX_FILENAME_LENGTH:
+            return False, ''
+
+        # Check extension
+        dot = filename.rfind('.')
+        # dot > 0 keeps Path.suffix semantics: a bare '.jpg' has no suffix
+        ext = filename[dot:].lower() if dot > 0 else ''
+        if ext not in SecureFileHandler.ALLOWED_EXTENSIONS:
+            return False, ''
+
+        # Build secure path; normpath collapses '..' lexically, without the
+        # per-component lstat calls that resolve() makes
+        if subdir:
+            full_path_str = os.path.normpath(os.path.join(base_str, subdir, filename))
+        else:
+            full_path_str = os.path.normpath(os.path.join(base_str, filename))
 
-            # Build secure path
-            if subdir:
-                full_path = (self.base_dir / subdir / filename).resolve()
-                # Ensure path is within base directory
-                if not str(full_path).startswith(str(self.base_dir)):
-                    return False, Path()
-            else:
-                full_path = (self.base_dir / filename).resolve()
-                if not str(full_path).startswith(str(self.base_dir)):
-                    return False, Path()
+        # Ensure path is within base directory (a bare prefix test would
+        # also accept siblings such as /data-other for /data)
+        if not SecureFileHandler._is_within_base(base_str, full_path_str):
+            return False, ''
 
-            return True, full_path
+        return True, full_path_str
 
-        except Exception as e:
-            logging.error(f"Error creating secure path: {e}")
-            return False, Path()
+    @staticmethod
+    def _is_within_base(base_str: str, path_str: str) -> bool:
+        """Check that a normalized path is the base directory or below it"""
+        return path_str == base_str or path_str.startswith(os.path.join(base_str, ''))
 
     def save_file_securely(self, filename: str, data: bytes, subdir: str = "") -> Tuple[bool, str]:
         """Save file with security checks"""
@@ -163,12 +215,11 @@ class SecureFileHandler:
             temp_path = file_path.with_suffix('.tmp')
             with open(temp_path, 'wb') as f:
                 f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
 
             # Verify file was written correctly
-            with open(temp_path, 'rb') as f:
-                written_data = f.read()
-
-            if len(written_data) != len(data):
+            if temp_path.stat().st_size != len(data):
                 temp_path.unlink(missing_ok=True)
                 return False, "File write verification failed"
 
@@ -192,8 +243,7 @@ class SecureFileHandler:
                 return False, b""
 
             # Check file size (prevent reading very large files)
-            max_size = 50 * 1024 * 1024  # 50MB
-            if file_path.stat().st_size > max_size:
+            if file_path.stat().st_size > self.MAX_READ_SIZE:
                 return False, b""
 
             with open(file_path, 'rb') as f:
@@ -215,10 +265,17 @@ class SecureFileHandler:
             if not file_path.exists():
                 return False, "File does not exist"
 
-            # Secure delete (overwrite before deleting)
-            if file_path.stat().st_size > 0:
-                with open(file_path, 'wb') as f:
-                    f.write(b'\x00' * file_path.stat().st_size)
+            # Secure delete (overwrite in place, in bounded chunks, before deleting)
+            remaining = file_path.stat().st_size
+            if remaining > 0:
+                zeros = memoryview(_ZERO_CHUNK)
+                with open(file_path, 'r+b') as f:
+                    while remaining:
+                        n = min(remaining, len(_ZERO_CHUNK))
+                        f.write(zeros[:n])
+                        remaining -= n
+                    f.flush()
+                    os.fsync(f.fileno())
 
             file_path.unlink()
             return True, "File deleted successfully"
@@ -230,8 +287,6 @@ class SecureFileHandler:
     def cleanup_directory(self, subdir: str = "", max_age_days: int = 30) -> int:
         """Clean up old files in directory"""
         try:
-            import time
-
             if subdir:
                 target_dir = (self.base_dir / subdir).resolve()
             else:
@@ -244,15 +299,14 @@ class SecureFileHandler:
             max_age_seconds = max_age_days * 24 * 60 * 60
             deleted_count = 0
 
-            for file_path in target_dir.rglob('*'):
-                if file_path.is_file():
-                    file_age = current_time - file_path.stat().st_mtime
-                    if file_age > max_age_seconds:
-                        try:
-                            file_path.unlink()
-                            deleted_count += 1
-                        except Exception as e:
-                            logging.warning(f"Failed to delete old file {file_path}: {e}")
+            for entry in _iter_files(target_dir):
+                file_age = current_time - entry.stat(follow_symlinks=False).st_mtime
+                if file_age > max_age_seconds:
+                    try:
+                        os.unlink(entry.path)
+                        deleted_count += 1
+                    except Exception as e:
+                        logging.warning(f"Failed to delete old file {entry.path}: {e}")
 
             return deleted_count
 
@@ -261,6 +315,12 @@ class SecureFileHandler:
             return 0
 
 
+# 'YYYY-MM-DDTHH:MM:SS[.ffffff]' with an explicit UTC designator
+_UTC_ISO_PATTERN = re.compile(
+    r'\A(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(\.\d+)?(?:Z|[+-]00:?00)\Z'
+)
+
+
 class PrivacyManager:
     """Manage privacy and data protection"""
 
@@ -295,19 +355,27 @@ class PrivacyManager:
 
     def _hash_string(self, text: str) -> str:
         """Hash a string for anonymization"""
-        return hashlib.sha256(text.encode()).hexdigest()[:16]
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
 
     def should_retain_data(self, timestamp) -> bool:
         """Check if data should be retained based on retention policy"""
-        import time
-        from datetime import datetime
-
-        if isinstance(timestamp, str):
-            # Assume ISO format
-            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        if isinstance(timestamp, (int, float)):
+            # Already epoch seconds
+            ts = float(timestamp)
+        elif isinstance(timestamp, str):
+            # Assume ISO format; explicit UTC strings skip datetime entirely
+            match = _UTC_ISO_PATTERN.match(timestamp)
+            if match:
+                y, mo, d, h, mi, sec, frac = match.groups()
+                ts = calendar.timegm((int(y), int(mo), int(d), int(h), int(mi), int(sec), 0, 0, 0))
+                if frac:
+                    ts += float(frac)
+            else:
+                ts = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+        else:
+            ts = timestamp.timestamp()
 
-        current_time = time.time()
-        data_age_seconds = current_time - timestamp.timestamp()
+        data_age_seconds = time.time() - ts
         max_age_seconds = self.data_retention_days * 24 * 60 * 60
 
         return data_age_seconds <= max_age_seconds
@@ -326,7 +394,21 @@ class SecurityConfig:
     SESSION_TIMEOUT = 60  # minutes
     REQUIRE_HTTPS = True
 
+# Common weak passwords rejected regardless of the character-class rules
+_WEAK_PASSWORDS = frozenset({
+    'password', '123456', '123456789', 'qwerty', 'abc123',
+    'password123', 'admin', 'letmein', 'welcome', 'monkey'
+})
+
 class PasswordValidator:
+    _SPECIAL_SET = frozenset('!@#$%^&*(),.?":{}|<>')
+    # Character-class bits collected by validate_password's single scan
+    _HAS_UPPER = 1
+    _HAS_LOWER = 2
+    _HAS_DIGIT = 4
+    _HAS_SPECIAL = 8
+    _HAS_ALL = 15
+
     @staticmethod
     def validate_password(password):
         """Validate password against security policy"""
@@ -338,82 +420,132 @@ class PasswordValidator:
         
         if len(password) < SecurityConfig.MIN_PASSWORD_LENGTH:
             errors.append(f"Password must be at least {SecurityConfig.MIN_PASSWORD_LENGTH} characters long")
+            return False, errors
         
         if len(password) > SecurityConfig.MAX_PASSWORD_LENGTH:
             errors.append(f"Password must not exceed {SecurityConfig.MAX_PASSWORD_LENGTH} characters")
+            return False, errors
         
-        if SecurityConfig.REQUIRE_UPPERCASE and not re.search(r'[A-Z]', password):
+        # Single pass over the password, recording seen character classes as bits
+        flags = 0
+        special = PasswordValidator._SPECIAL_SET
+        for c in password:
+            if 'A' <= c <= 'Z':
+                flags |= PasswordValidator._HAS_UPPER
+            elif 'a' <= c <= 'z':
+                flags |= PasswordValidator._HAS_LOWER
+            elif '0' <= c <= '9':
+                flags |= PasswordValidator._HAS_DIGIT
+            elif c in special:
+                flags |= PasswordValidator._HAS_SPECIAL
+            if flags == PasswordValidator._HAS_ALL:
+                break
+        
+        if SecurityConfig.REQUIRE_UPPERCASE and not flags & PasswordValidator._HAS_UPPER:
             errors.append("Password must contain at least one uppercase letter")
         
-        if SecurityConfig.REQUIRE_LOWERCASE and not re.search(r'[a-z]', password):
+        if SecurityConfig.REQUIRE_LOWERCASE and not flags & PasswordValidator._HAS_LOWER:
             errors.append("Password must contain at least one lowercase letter")
         
-        if SecurityConfig.REQUIRE_DIGITS and not re.search(r'\d', password):
+        if SecurityConfig.REQUIRE_DIGITS and not flags & PasswordValidator._HAS_DIGIT:
             errors.append("Password must contain at least one digit")
         
-        if SecurityConfig.REQUIRE_SPECIAL_CHARS and not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
+        if SecurityConfig.REQUIRE_SPECIAL_CHARS and not flags & PasswordValidator._HAS_SPECIAL:
             errors.append("Password must contain at least one special character")
         
         # Check for common weak passwords
-        weak_passwords = [
-            'password', '123456', '123456789', 'qwerty', 'abc123',
-            'password123', 'admin', 'letmein', 'welcome', 'monkey'
-        ]
-        if password.lower() in weak_passwords:
+        if password.lower() in _WEAK_PASSWORDS:
             errors.append("Password is too common. Please choose a stronger password")
         
         return len(errors) == 0, errors
 
 class RateLimiter:
-    def __init__(self):
-        self.attempts = {}  # IP -> {count: int, last_attempt: datetime}
-    
+    MAX_TRACKED = 10000  # Upper bound on tracked IPs; least recently updated are evicted
+    NUM_SHARDS = 16  # Power of two; each shard has its own lock
+
+    def __init__(self, max_tracked=None):
+        max_tracked = max_tracked or self.MAX_TRACKED
+        # Per shard: IP -> {count: int, last_attempt: float (time.monotonic)},
+        # ordered by last_attempt and guarded by the shard's lock
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(self.NUM_SHARDS)]
+        self._shard_capacity = max(1, -(-max_tracked // self.NUM_SHARDS))
+        # Longest lockout window seen; entries idle for longer can be forgotten
+        self._retention = SecurityConfig.LOGIN_LOCKOUT_DURATION * 60
+
+    def _shard(self, ip_address):
+        return self._shards[hash(ip_address) & (self.NUM_SHARDS - 1)]
+
+    def _touch(self, attempts, ip_address, attempts_data, now):
+        """Store an entry as most recently updated and keep the shard bounded"""
+        attempts_data['last_attempt'] = now
+        attempts[ip_address] = attempts_data
+        attempts.move_to_end(ip_address)
+        self._evict(attempts, now)
+
+    def _evict(self, attempts, now):
+        """Drop expired entries from the front, then enforce the size cap"""
+        while attempts:
+            oldest = next(iter(attempts.values()))
+            if now - oldest['last_attempt'] <= self._retention:
+                break
+            attempts.popitem(last=False)
+        while len(attempts) > self._shard_capacity:
+            attempts.popitem(last=False)
+
     def is_rate_limited(self, ip_address, max_attempts=None, lockout_duration=None):
         """Check if IP is rate limited"""
         if max_attempts is None:
             max_attempts = SecurityConfig.MAX_LOGIN_ATTEMPTS
         if lockout_duration is None:
             lockout_duration = SecurityConfig.LOGIN_LOCKOUT_DURATION
-        
-        now = datetime.now()
-        
-        if ip_address not in self.attempts:
-            self.attempts[ip_address] = {'count': 0, 'last_attempt': now}
-            return False
-        
-        attempts_data = self.attempts[ip_address]
-        
-        # Reset if lockout period has passed
-        if now - attempts_data['last_attempt'] > timedelta(minutes=lockout_duration):
-            attempts_data['count'] = 0
-            attempts_data['last_attempt'] = now
-            return False
-        
-        # Check if rate limited
-        if attempts_data['count'] >= max_attempts:
-            return True
-        
-        return False
+        self._retention = max(self._retention, lockout_duration * 60)
+
+        lock, attempts = self._shard(ip_address)
+        with lock:
+            now = time.monotonic()
+
+            if ip_address not in attempts:
+                self._touch(attempts, ip_address, {'count': 0}, now)
+                return False
+
+            attempts_data = attempts[ip_address]
+
+            # Reset if lockout period has passed
+            if now - attempts_data['last_attempt'] > lockout_duration * 60:
+                attempts_data['count'] = 0
+                self._touch(attempts, ip_address, attempts_data, now)
+                return False
+
+            # Check if rate limited
+            return attempts_data['count'] >= max_attempts
     
     def record_attempt(self, ip_address):
         """Record a failed attempt"""
-        now = datetime.now()
-        if ip_address not in self.attempts:
-            self.attempts[ip_address] = {'count': 1, 'last_attempt': now}
-        else:
-            self.attempts[ip_address]['count'] += 1
-            self.attempts[ip_address]['last_attempt'] = now
+        lock, attempts = self._shard(ip_address)
+        with lock:
+            attempts_data = attempts.get(ip_address)
+            if attempts_data is None:
+                attempts_data = {'count': 0}
+            attempts_data['count'] += 1
+            self._touch(attempts, ip_address, attempts_data, time.monotonic())
     
     def clear_attempts(self, ip_address):
         """Clear attempts for successful login"""
-        if ip_address in self.attempts:
-            del self.attempts[ip_address]
+        lock, attempts = self._shard(ip_address)
+        with lock:
+            attempts.pop(ip_address, None)
+
+# Snapshots of per-request constants used by the decorators below
+_REQUIRE_HTTPS = SecurityConfig.REQUIRE_HTTPS
+_CSRF_METHODS = frozenset(('POST', 'PUT', 'DELETE'))
 
 def require_https(f):
     """Decorator to require HTTPS for production"""
+    require_https = _REQUIRE_HTTPS
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if SecurityConfig.REQUIRE_HTTPS and not request.is_secure:
+        if require_https and not request.is_secure:
             return jsonify({
                 'error': 'HTTPS required',
                 'message': 'This endpoint requires a secure HTTPS connection'
@@ -429,9 +561,10 @@ def validate_csrf_token(f):
     """Decorator to validate CSRF tokens"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if request.method in ['POST', 'PUT', 'DELETE']:
+        if request.method in _CSRF_METHODS:
             token = request.headers.get('X-CSRF-Token')
-            if not token or token != session.get('csrf_token'):
+            session_token = session.get('csrf_token')
+            if not token or not session_token or not secrets.compare_digest(token, session_token):
                 return jsonify({
                     'error': 'Invalid CSRF token',
                     'message': 'CSRF validation failed'
@@ -443,4 +576,7 @@ def validate_csrf_token(f):
 input_validator = InputValidator()
 file_handler = SecureFileHandler("data")
 privacy_manager = PrivacyManager()
-rate_limiter = RateLimiter()
\ No newline at end of file
+rate_limiter = RateLimiter()
+# Per-IP request limits; create_app points RATELIMIT_STORAGE_URI at Redis when it
+# is configured so the counters are shared across workers
+limiter = Limiter(key_func=get_remote_address)
@@ -1,19 +1,67 @@
 import os
 import json
-from typing import Dict, List, Optional, Tuple
+import multiprocessing
+import shutil
+import sys
+import threading
+import time
+from queue import Empty
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 
 
 import logging
 
+# orjson is optional; it (de)serializes straight to/from bytes and is much faster
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode('utf-8')
+
+    _json_loads = json.loads
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 # New canonical folder for recognition reference images
 DATASET_DIR = os.path.join(PROJECT_ROOT, 'data', 'faces')
 STUDENTS_JSON = os.path.join(DATASET_DIR, 'students.json')
+_DATASET_PREFIX = DATASET_DIR + os.sep
 
 logger = logging.getLogger(__name__)
 
+# Set once the dataset directory and students.json have been prepared
+_INITIALIZED = False
+
+# Parsed students.json, reused until the file's mtime changes
+_STUDENTS_CACHE = {'mtime': None, 'data': None}
+_STUDENTS_CACHE_LOCK = threading.Lock()
+
+# Retraining is debounced: requests set a marker and wake one background worker,
+# which hands a job to the trainer process
+RETRAIN_MARKER = os.path.join(DATASET_DIR, '.retrain_needed')
+# The trainer moves the marker here while it runs and removes it once training succeeds
+RETRAIN_RUNNING_MARKER = RETRAIN_MARKER + '.running'
+RETRAIN_DEBOUNCE_SECONDS = 2.0
+_retrain_requested = threading.Event()
+_retrain_lock = threading.Lock()
+_retrain_thread: Optional[threading.Thread] = None
+# Training itself runs in a separate long-lived process fed through a queue
+_trainer_process = None
+_trainer_queue = None
+
 
 def ensure_dataset_dirs() -> None:
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
     os.makedirs(DATASET_DIR, exist_ok=True)
     try:
         os.chmod(DATASET_DIR, 0o777)
@@ -35,41 +83,148 @@ def ensure_dataset_dirs() -> None:
         except Exception:
             pass
     if not os.path.exists(STUDENTS_JSON):
-        with open(STUDENTS_JSON, 'w') as f:
-            json.dump({}, f, indent=2)
+        with open(STUDENTS_JSON, 'wb') as f:
+            f.write(_json_dumps({}))
         try:
             os.chmod(STUDENTS_JSON, 0o666)
         except Exception:
             pass
-    elif os.path.exists(STUDENTS_JSON):
+    _INITIALIZED = True
+    # A retrain requested before the last shutdown never ran or never finished; queue it again
+    if os.path.exists(RETRAIN_MARKER) or os.path.exists(RETRAIN_RUNNING_MARKER):
+        _mark_dirty()
+
+
+def _copy_students(students: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    # Callers mutate what they load, so never hand out the cached dict itself
+    return {sid: dict(meta) for sid, meta in students.items()}
+
+
+def _mark_dirty() -> None:
+    """Request a retrain; bursts of requests are coalesced into one run."""
+    global _retrain_thread
+    try:
+        with open(RETRAIN_MARKER, 'a'):
+            pass
+    except OSError as e:
+        logger.warning(f"Failed to write retrain marker: {e}")
+    with _retrain_lock:
+        if _retrain_thread is None or not _retrain_thread.is_alive():
+            _retrain_thread = threading.Thread(target=_retrain_worker, name='face-retrain', daemon=True)
+            _retrain_thread.start()
+    _retrain_requested.set()
+
+
+def _retrain_worker() -> None:
+    while True:
+        _retrain_requested.wait()
+        # Wait until requests stop arriving for a full debounce interval
+        while True:
+            _retrain_requested.clear()
+            time.sleep(RETRAIN_DEBOUNCE_SECONDS)
+            if not _retrain_requested.is_set():
+                break
+        # The marker stays until the trainer has finished the run it asks for
         try:
-            os.chmod(STUDENTS_JSON, 0o666)
-        except Exception:
+            _get_trainer_queue().put('retrain')
+        except Exception as e:
+            logger.warning(f"Failed to trigger training: {e}")
+
+
+def _get_trainer_queue():
+    """Return the queue of the long-lived trainer process, starting it if needed."""
+    global _trainer_process, _trainer_queue
+    with _retrain_lock:
+        if _trainer_process is None or not _trainer_process.is_alive():
+            # spawn: never fork the web server's threads or an initialized CUDA context
+            ctx = multiprocessing.get_context('spawn')
+            _trainer_queue = ctx.Queue()
+            _trainer_process = ctx.Process(target=_trainer_loop, args=(_trainer_queue,),
+                                           name='face-trainer', daemon=True)
+            _trainer_process.start()
+        return _trainer_queue
+
+
+def _trainer_loop(queue) -> None:
+    """Trainer process: import train_faces once, then retrain per queued job."""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.append(PROJECT_ROOT)
+    from train_faces import train_faces
+    while True:
+        job = queue.get()
+        if job is None:
+            return
+        # Jobs queued while the previous run was going are satisfied by one run
+        try:
+            while True:
+                if queue.get_nowait() is None:
+                    return
+        except Empty:
+            pass
+        # Take over the marker before training, so a request arriving during the run
+        # writes a fresh one; the taken marker survives a crash until the run succeeds
+        try:
+            os.replace(RETRAIN_MARKER, RETRAIN_RUNNING_MARKER)
+        except OSError:
+            pass
+        try:
+            # This process is daemonic and cannot start a worker pool
+            train_faces(workers=1)
+        except Exception as e:
+            logger.warning(f"Failed to run training: {e}")
+            continue
+        try:
+            os.remove(RETRAIN_RUNNING_MARKER)
+        except OSError:
             pass
 
 
 def load_students() -> Dict[str, Dict[str, str]]:
     ensure_dataset_dirs()
-    try:
-        with open(STUDENTS_JSON, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    with _STUDENTS_CACHE_LOCK:
+        try:
+            mtime = os.stat(STUDENTS_JSON).st_mtime_ns
+            if _STUDENTS_CACHE['mtime'] != mtime:
+                with open(STUDENTS_JSON, 'rb') as f:
+                    _STUDENTS_CACHE['data'] = _json_loads(f.read())
+                _STUDENTS_CACHE['mtime'] = mtime
+            return _copy_students(_STUDENTS_CACHE['data'])
+        except Exception:
+            return {}
 
 
 def save_students(students: Dict[str, Dict[str, str]]) -> None:
     ensure_dataset_dirs()
-    with open(STUDENTS_JSON, 'w') as f:
-        json.dump(students, f, indent=2)
+    # Serialize first so the document goes out in a single write
+    data = _json_dumps(students)
+    with _STUDENTS_CACHE_LOCK:
+        # Write a sibling file and rename it over the original so a crash
+        # mid-write never leaves a truncated students.json behind
+        tmp_path = STUDENTS_JSON + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        try:
+            os.chmod(tmp_path, 0o666)
+        except Exception:
+            pass
+        os.replace(tmp_path, STUDENTS_JSON)
+        _STUDENTS_CACHE['mtime'] = os.stat(STUDENTS_JSON).st_mtime_ns
+        _STUDENTS_CACHE['data'] = _copy_students(students)
 
 
 def get_student_dir(student_id: str) -> str:
-    return os.path.join(DATASET_DIR, student_id)
+    # student_id is a single path component (a username), so plain
+    # concatenation is equivalent to os.path.join here
+    return _DATASET_PREFIX + student_id
 
 
-def add_student(student_id: str, name: str, image_bytes: bytes, image_ext: str = '.jpg') -> Tuple[bool, str]:
+def add_student(student_id: str, name: str, image_bytes: Union[bytes, BinaryIO],
+                image_ext: str = '.jpg') -> Tuple[bool, str]:
     """Add or update a student and save their primary image.
 
+    image_bytes may also be a readable binary stream, which is copied to disk
+    in chunks instead of being read into memory first.
+
     Returns (ok, path_or_error)
     """
     ensure_dataset_dirs()
@@ -84,27 +239,25 @@ def add_student(student_id: str, name: str, image_bytes: bytes, image_ext: str =
     sdir = get_student_dir(student_id)
     os.makedirs(sdir, exist_ok=True)
     img_path = os.path.join(sdir, f'{student_id}{image_ext}')
+    # The upload is stored byte-for-byte (no decode/re-encode) and swapped in
+    # atomically, so the trainer and photo views never see a partial file
+    tmp_path = img_path + '.tmp'
     try:
-        with open(img_path, 'wb') as f:
-            f.write(image_bytes)
+        with open(tmp_path, 'wb') as f:
+            if hasattr(image_bytes, 'read'):
+                shutil.copyfileobj(image_bytes, f, length=1 << 20)
+            else:
+                f.write(image_bytes)
+        os.replace(tmp_path, img_path)
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False, f'Failed to save image: {e}'
 
     save_students(students)
     
     # Trigger training to update encodings
-    try:
-        # We import here to avoid circular imports if train_faces imports this module
-        import sys
-        if PROJECT_ROOT not in sys.path:
-            sys.path.append(PROJECT_ROOT)
-        
-        # Use a subprocess to run training to avoid any import/context issues
-        import subprocess
-        subprocess.Popen([sys.executable, os.path.join(PROJECT_ROOT, 'train_faces.py')])
-        
-    except Exception as e:
-        logger.warning(f"Failed to trigger training: {e}")
+    _mark_dirty()
         
     return True, img_path
 
@@ -115,18 +268,8 @@ def remove_student(student_id: str) -> Tuple[bool, str]:
     if student_id not in students:
         return False, 'Student not found'
     try:
-        # Remove files in student dir
-        sdir = get_student_dir(student_id)
-        if os.path.isdir(sdir):
-            for name in os.listdir(sdir):
-                try:
-                    os.remove(os.path.join(sdir, name))
-                except Exception:
-                    pass
-            try:
-                os.rmdir(sdir)
-            except Exception:
-                pass
+        # Remove the student dir and everything in it
+        shutil.rmtree(get_student_dir(student_id), ignore_errors=True)
         students.pop(student_id, None)
         save_students(students)
         return True, 'Removed'
@@ -151,27 +294,24 @@ def save_student_photo(student_id: str, image_bytes: bytes, image_ext: str = '.j
     sdir = get_student_dir(student_id)
     os.makedirs(sdir, exist_ok=True)
     
-    # Find next available photo number
+    # Find next available photo number from a single directory listing
+    prefix = f'{student_id}_'
     photo_num = 1
-    while True:
-        img_path = os.path.join(sdir, f'{student_id}_{photo_num}{image_ext}')
-        if not os.path.exists(img_path):
-            break
-        photo_num += 1
+    with os.scandir(sdir) as it:
+        for entry in it:
+            if not entry.name.startswith(prefix) or not entry.is_file():
+                continue
+            suffix = os.path.splitext(entry.name[len(prefix):])[0]
+            if suffix.isdigit():
+                photo_num = max(photo_num, int(suffix) + 1)
+    img_path = os.path.join(sdir, f'{student_id}_{photo_num}{image_ext}')
         
     try:
         with open(img_path, 'wb') as f:
             f.write(image_bytes)
             
         # Trigger training to update encodings
-        try:
-            # We import here to avoid circular imports if train_faces imports this module
-            import sys
-            sys.path.append(PROJECT_ROOT)
-            from train_faces import train_faces
-            train_faces()
-        except Exception as e:
-            logger.warning(f"Failed to trigger training: {e}")
+        _mark_dirty()
             
         return True, img_path
     except Exception as e:
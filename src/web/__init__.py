@@ -1,4 +1,6 @@
-from flask import Blueprint
+from functools import wraps
+
+from flask import Blueprint, redirect, session, url_for
 
 web_auth_bp = Blueprint('web_auth', __name__)
 web_student_bp = Blueprint('web_student', __name__)
@@ -7,4 +9,16 @@ web_admin_bp = Blueprint('web_admin', __name__)
 web_parent_bp = Blueprint('web_parent', __name__)
 web_common_bp = Blueprint('web_common', __name__)
 
+
+def require_role(role=None):
+    """Decorator redirecting to login unless the session user has the given role (any role if None)"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if session.get('user_id') is None or (role is not None and session.get('role') != role):
+                return redirect(url_for('web_auth.login'))
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 from . import auth, student, teacher, admin, parent, common
@@ -1,56 +1,52 @@
-from flask import render_template, session, redirect, url_for
-from . import web_admin_bp
+from flask import render_template, session, g
+from . import web_admin_bp, require_role
+
+@web_admin_bp.before_request
+def _load_template_context():
+    """Build the shared template context once per request"""
+    g.tmpl_ctx = {'user_role': 'admin', 'username': session.get('username', 'admin')}
 
 @web_admin_bp.route('/admin/dashboard')
+@require_role('admin')
 def admin_dashboard():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_dashboard.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_dashboard.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/users')
+@require_role('admin')
 def admin_users():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_users.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_users.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/announcements')
+@require_role('admin')
 def admin_announcements():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_announcements.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_announcements.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/ml-insights')
+@require_role('admin')
 def admin_ml_insights():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_ml_insights.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_ml_insights.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/classes')
+@require_role('admin')
 def admin_classes():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_classes.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_classes.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/admins')
+@require_role('admin')
 def admin_admins():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_admins.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_admins.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/students')
+@require_role('admin')
 def admin_students():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_students.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_students.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/teachers')
+@require_role('admin')
 def admin_teachers():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_teachers.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_teachers.html', **g.tmpl_ctx)
 
 @web_admin_bp.route('/admin/analytics')
+@require_role('admin')
 def admin_analytics():
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return redirect(url_for('web_auth.login'))
-    return render_template('admin_analytics.html', user_role='admin', username=session.get('username', 'admin'))
+    return render_template('admin_analytics.html', **g.tmpl_ctx)
@@ -1,72 +1,130 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, g
 from src.models import db, User, UserRole, FaceEncoding
-from . import web_auth_bp
+from src.cache import get_cached_user, forget_cached_user
+from src.security import limiter
+from flask_limiter.util import get_remote_address
+from . import web_auth_bp, require_role
 import logging
+from datetime import datetime
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+def _login_rate_key():
+    """Client address plus submitted username, so users behind one NAT don't share a bucket"""
+    username = (request.form.get('username') or '').strip().lower()
+    return f"{get_remote_address()}:{username}"
 
 @web_auth_bp.route('/login', methods=['GET', 'POST'])
+# Guessing against one account is capped per address; the looser per-address
+# limit still bounds spraying across many accounts
+@limiter.limit('5 per minute', methods=['POST'], key_func=_login_rate_key)
+@limiter.limit('60 per minute', methods=['POST'])
 def login():
-    logging.info(f"Login attempt - Method: {request.method}")
-
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
 
-        logging.info(f"Login attempt for email: {username}")
+        # Empty credentials never reach the database or the password hasher
+        if not username or not password:
+            flash('Invalid credentials', 'error')
+            return render_template('login.html')
+
+        logger.info("Login attempt for email: %s", username)
 
         user = User.query.filter_by(email=username).first()
-        logging.info(f"User found: {user is not None}")
 
         if user:
-            logging.info(f"User details - ID: {user.id}, Role: {user.role.value}")
             password_valid = user.check_password(password)
-            logging.info(f"Password check result: {password_valid}")
 
             if password_valid:
+                # Persist a transparently upgraded password hash
+                if db.session.is_modified(user):
+                    db.session.commit()
+
                 # Set session
                 session['user_id'] = user.id
                 session['username'] = user.username
                 session['role'] = user.role.value
-                logging.info(f"Session set - user_id: {session['user_id']}, role: {session['role']}")
+                _cache_profile(user)
+                logger.debug("Session set - user_id: %s, role: %s", user.id, user.role.value)
 
                 # Redirect to appropriate dashboard
                 if user.role.value == 'student':
-                    logging.info("Redirecting to student dashboard")
                     return redirect(url_for('web_student.student_dashboard'))
                 elif user.role.value == 'teacher':
-                    logging.info("Redirecting to teacher dashboard")
                     return redirect(url_for('web_teacher.teacher_dashboard'))
                 elif user.role.value == 'admin':
-                    logging.info("Redirecting to admin dashboard")
                     return redirect(url_for('web_admin.admin_dashboard'))
                 else:
-                    logging.error(f"Unknown role: {user.role.value}")
+                    logger.error("Unknown role: %s", user.role.value)
             else:
-                logging.warning("Password check failed")
+                logger.warning("Password check failed for email: %s", username)
         else:
-            logging.warning(f"User not found: {username}")
+            User.check_dummy_password(password)
+            logger.warning("User not found: %s", username)
 
-        logging.info("Login failed - showing error message")
         flash('Invalid credentials', 'error')
 
     return render_template('login.html')
 
 @web_auth_bp.route('/logout')
 def logout():
+    user_id = session.get('user_id')
+    # With server-side sessions this also drops the identity from the stored
+    # record, so a captured session cookie stops authenticating immediately
     session.clear()
+    if user_id is not None:
+        forget_cached_user(user_id)
     flash('You have been logged out successfully', 'success')
     return redirect(url_for('web_auth.login'))
 
 from src.utils.dataset_manager import save_student_photo, get_student_dir, add_student, rename_student_directory
 
+def _cache_profile(user):
+    """Keep the account creation time, which never changes, in the session"""
+    session['profile'] = {
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+    }
+
+def _profile_snapshot():
+    """Build the profile page's user fields without loading the row, or None if unavailable.
+
+    Editable fields come from get_cached_user, which every user write
+    invalidates; only the immutable creation time is kept in the session.
+    """
+    cached = session.get('profile')
+    if not cached:
+        return None
+    user = get_cached_user(session['user_id'])
+    if user is None:
+        return None
+    created_at = cached.get('created_at')
+    return SimpleNamespace(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        role=user.role,
+        created_at=datetime.fromisoformat(created_at) if created_at else None,
+    )
+
+def _get_face_encoding(user_id):
+    """Look up a user's FaceEncoding once per request"""
+    cache = g.setdefault('face_encodings', {})
+    if user_id not in cache:
+        cache[user_id] = FaceEncoding.query.filter_by(student_id=user_id).first()
+    return cache[user_id]
+
 @web_auth_bp.route('/profile', methods=['GET', 'POST'])
+@require_role()
 def profile():
-    if 'user_id' not in session:
-        return redirect(url_for('web_auth.login'))
-
-    user = User.query.get(session['user_id'])
-    if not user:
-        session.clear()
-        return redirect(url_for('web_auth.login'))
+    # GET renders from the cached user snapshot; only POST needs the row
+    user = _profile_snapshot() if request.method == 'GET' else None
+    if user is None:
+        user = User.query.get(session['user_id'])
+        if not user:
+            session.clear()
+            return redirect(url_for('web_auth.login'))
 
     if request.method == 'POST':
         action = request.form.get('action')
@@ -76,16 +134,15 @@ def profile():
             new_email = request.form.get('email')
 
             if new_username and new_email:
-                # Check if username or email is already taken by another user
-                existing_user = User.query.filter(
-                    (User.username == new_username) | (User.email == new_email)
-                ).filter(User.id != user.id).first()
-
-                if existing_user:
-                    if existing_user.username == new_username:
-                        flash('Username already taken', 'error')
-                    else:
-                        flash('Email already taken', 'error')
+                # Check if username or email is already taken by another user;
+                # two lookups that each hit a unique index instead of one OR scan
+                username_owner = User.query.with_entities(User.id).filter_by(username=new_username).first()
+                email_owner = User.query.with_entities(User.id).filter_by(email=new_email).first()
+
+                if username_owner and username_owner.id != user.id:
+                    flash('Username already taken', 'error')
+                elif email_owner and email_owner.id != user.id:
+                    flash('Email already taken', 'error')
                 else:
                     # Rename directory if username changed
                     if user.username != new_username:
@@ -94,13 +151,15 @@ def profile():
                     user.username = new_username
                     user.email = new_email
                     db.session.commit()
+                    forget_cached_user(user.id)
                     session['username'] = new_username  # Update session
                     flash('Profile updated successfully', 'success')
             else:
                 flash('Username and Email are required', 'error')
 
-        elif action == 'update_password':
-            # Update password
+        elif action == 'update_password' or request.form.get('current_password'):
+            # Update password; forms without an action count as a password
+            # update when they carry the current password
             current_password = request.form.get('current_password')
             new_password = request.form.get('new_password')
             confirm_password = request.form.get('confirm_password')
@@ -113,31 +172,19 @@ def profile():
                 else:
                     user.set_password(new_password)
                     db.session.commit()
+                    forget_cached_user(user.id)
                     flash('Password updated successfully', 'success')
             else:
                 flash('Please fill in all password fields', 'error')
-        
+
         else:
-             # Fallback for legacy or unspecified action (assume password update if password fields present)
-            if request.form.get('current_password'):
-                 current_password = request.form.get('current_password')
-                 new_password = request.form.get('new_password')
-                 confirm_password = request.form.get('confirm_password')
-
-                 if current_password and new_password:
-                    if not user.check_password(current_password):
-                        flash('Current password is incorrect', 'error')
-                    elif new_password != confirm_password:
-                        flash('New passwords do not match', 'error')
-                    else:
-                        user.set_password(new_password)
-                        db.session.commit()
-                        flash('Password updated successfully', 'success')
-            else:
-                flash('Invalid action', 'error')
+            flash('Invalid action', 'error')
+
+    if isinstance(user, User):
+        _cache_profile(user)
 
     # Get face encoding
-    face_encoding = FaceEncoding.query.filter_by(student_id=user.id).first()
+    face_encoding = _get_face_encoding(user.id)
 
     return render_template('profile.html', 
                          user=user, 
@@ -146,11 +193,11 @@ def profile():
                          username=session.get('username'))
 
 import os
-from werkzeug.utils import secure_filename
 
-from flask import send_file
+from flask import send_file, current_app
 
 @web_auth_bp.route('/profile/upload-photo', methods=['POST'])
+@limiter.limit('10 per hour')
 def upload_photo():
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -165,23 +212,21 @@ def upload_photo():
     if file:
         try:
             user_id = session['user_id']
-            user = User.query.get(user_id)
+            user = get_cached_user(user_id)
             if not user:
                 return jsonify({'error': 'User not found'}), 404
 
-            # Read file bytes
-            image_bytes = file.read()
-            
             # Save using dataset manager (saves to data/faces/{username}/{username}.jpg)
-            # We use add_student to ensure it overwrites the primary image
-            success, result = add_student(user.username, user.full_name or user.username, image_bytes)
+            # We use add_student to ensure it overwrites the primary image; the
+            # upload stream is copied to disk without buffering it in memory
+            success, result = add_student(user.username, user.full_name or user.username, file.stream)
             
             if not success:
                 return jsonify({'error': result}), 500
             
             # Update or create FaceEncoding record
             # We set image_path to None so the system looks in data/faces (default location)
-            encoding_record = FaceEncoding.query.filter_by(student_id=user_id).first()
+            encoding_record = _get_face_encoding(user_id)
             if not encoding_record:
                 encoding_record = FaceEncoding(
                     student_id=user_id,
@@ -200,20 +245,26 @@ def upload_photo():
             return jsonify({'error': 'Failed to upload photo'}), 500
 
 @web_auth_bp.route('/profile/photo')
+@require_role()
 def get_my_photo():
     """Serve the current user's profile photo"""
-    if 'user_id' not in session:
-        return redirect(url_for('web_auth.login'))
-        
-    user = User.query.get(session['user_id'])
+    user = get_cached_user(session['user_id'])
     if not user:
         return jsonify({'error': 'User not found'}), 404
         
-    # Check data/faces/{username}/{username}.jpg
-    photo_path = os.path.join(os.getcwd(), 'data', 'faces', user.username, f"{user.username}.jpg")
+    # Check data/faces/{username}/{username}.jpg; send_file's own stat doubles
+    # as the existence check
+    photo_path = f"{get_student_dir(user.username)}{os.sep}{user.username}.jpg"
     
-    if os.path.exists(photo_path):
-        return send_file(photo_path, mimetype='image/jpeg')
-    else:
+    try:
+        response = send_file(photo_path, mimetype='image/jpeg', conditional=True, etag=True)
+    except FileNotFoundError:
         # Return default avatar
-        return send_file(os.path.join(os.getcwd(), 'static', 'images', 'default-avatar.svg'), mimetype='image/svg+xml')
+        response = send_file(os.path.join(current_app.static_folder, 'images', 'default-avatar.svg'),
+                             mimetype='image/svg+xml', conditional=True, etag=True)
+
+    # The URL is fixed while the photo can be replaced, so let browsers keep a
+    # private copy but revalidate it; unchanged photos come back as a bodyless 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -1,8 +1,7 @@
-from flask import render_template, session, redirect, url_for
-from . import web_parent_bp
+from flask import render_template, session
+from . import web_parent_bp, require_role
 
 @web_parent_bp.route('/parent/dashboard')
+@require_role('parent')
 def parent_dashboard():
-    if 'user_id' not in session or session.get('role') != 'parent':
-        return redirect(url_for('web_auth.login'))
     return render_template('parent_dashboard.html', user_role='parent', username=session.get('username', 'parent'))
@@ -1,41 +1,57 @@
-from flask import render_template, session, redirect, url_for
-from . import web_student_bp
+from flask import render_template, session
+from . import web_student_bp, require_role
 
-from src.models import Enrollment, Class, Course, User
+from src.models import db, Enrollment, Class, Course, User
+from src.cache import CacheKeys, get_cached_user, get_cached_schedule
 
-@web_student_bp.route('/student/dashboard')
-def student_dashboard():
-    if 'user_id' not in session or session.get('role') != 'student':
-        return redirect(url_for('web_auth.login'))
-    
-    user_id = session['user_id']
+def _build_student_schedule(user_id):
+    """Collect the student's class name and weekly course schedule"""
     enrollment = Enrollment.query.filter_by(student_id=user_id).first()
     
     schedule = []
     class_name = None
     
     if enrollment:
-        class_obj = Class.query.get(enrollment.class_id)
-        if class_obj:
-            class_name = class_obj.name
-            courses = Course.query.filter_by(class_id=enrollment.class_id).all()
+        class_name = db.session.query(Class.name).filter(
+            Class.id == enrollment.class_id
+        ).scalar()
+        if class_name is not None:
+            # One query for the courses and their teachers instead of one per course
+            rows = db.session.query(
+                Course.id, Course.name, Course.day_of_week, Course.start_time,
+                Course.end_time, Course.room, User.id, User.full_name
+            ).outerjoin(
+                User, Course.teacher_id == User.id
+            ).filter(
+                Course.class_id == enrollment.class_id
+            ).all()
             
             # Serialize courses for the template
-            for course in courses:
-                teacher = User.query.get(course.teacher_id)
-                teacher_name = teacher.full_name if teacher else "Unknown"
+            for course_id, name, day_of_week, start_time, end_time, room, teacher_id, teacher_full_name in rows:
+                teacher_name = teacher_full_name if teacher_id is not None else "Unknown"
                 
                 schedule.append({
-                    'id': course.id,
-                    'name': course.name,
-                    'day_of_week': course.day_of_week,
-                    'start_time': course.start_time.strftime('%H:%M'),
-                    'end_time': course.end_time.strftime('%H:%M'),
-                    'room': course.room,
+                    'id': course_id,
+                    'name': name,
+                    'day_of_week': day_of_week,
+                    'start_time': start_time.isoformat(timespec='minutes'),
+                    'end_time': end_time.isoformat(timespec='minutes'),
+                    'room': room,
                     'teacher_name': teacher_name
                 })
 
-    user = User.query.get(user_id)
+    return {'class_name': class_name, 'schedule': schedule}
+
+@web_student_bp.route('/student/dashboard')
+@require_role('student')
+def student_dashboard():
+    user_id = session['user_id']
+    cached = get_cached_schedule(CacheKeys.STUDENT_SCHEDULE, user_id,
+                                 lambda: _build_student_schedule(user_id))
+    schedule = cached['schedule']
+    class_name = cached['class_name']
+
+    user = get_cached_user(user_id)
     
     return render_template('student_dashboard.html', 
                          user_role='student', 
@@ -45,7 +61,6 @@ def student_dashboard():
                          class_name=class_name)
 
 @web_student_bp.route('/student/attendance')
+@require_role('student')
 def student_attendance():
-    if 'user_id' not in session or session.get('role') != 'student':
-        return redirect(url_for('web_auth.login'))
     return render_template('student_attendance.html', user_role='student', username=session.get('username', 'student'))
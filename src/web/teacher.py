@@ -1,61 +1,69 @@
 from flask import render_template, session, redirect, url_for
-from . import web_teacher_bp
+from . import web_teacher_bp, require_role
 
-from src.models import Course, Class
+from src.models import db, Course, Class
+from src.cache import CacheKeys, get_cached_schedule
 
-@web_teacher_bp.route('/teacher/dashboard')
-def teacher_dashboard():
-    if 'user_id' not in session or session.get('role') != 'teacher':
-        return redirect(url_for('web_auth.login'))
-    
-    user_id = session['user_id']
-    courses = Course.query.filter_by(teacher_id=user_id).all()
+def _build_teacher_schedule(user_id):
+    """Collect the teacher's weekly course schedule"""
+    # Courses with their class names in one query instead of one per course
+    rows = db.session.query(
+        Course.id, Course.name, Course.day_of_week, Course.start_time,
+        Course.end_time, Course.room, Class.name
+    ).outerjoin(
+        Class, Course.class_id == Class.id
+    ).filter(
+        Course.teacher_id == user_id
+    ).all()
     
     schedule = []
     
-    for course in courses:
+    for course_id, name, day_of_week, start_time, end_time, room, class_obj_name in rows:
         # Get class name for context
-        class_obj = Class.query.get(course.class_id)
-        class_name = class_obj.name if class_obj else "Unknown Class"
+        class_name = class_obj_name if class_obj_name is not None else "Unknown Class"
         
         schedule.append({
-            'id': course.id,
-            'name': course.name,
-            'day_of_week': course.day_of_week,
-            'start_time': course.start_time.strftime('%H:%M'),
-            'end_time': course.end_time.strftime('%H:%M'),
-            'room': course.room,
+            'id': course_id,
+            'name': name,
+            'day_of_week': day_of_week,
+            'start_time': start_time.isoformat(timespec='minutes'),
+            'end_time': end_time.isoformat(timespec='minutes'),
+            'room': room,
             'class_name': class_name
         })
 
+    return schedule
+
+@web_teacher_bp.route('/teacher/dashboard')
+@require_role('teacher')
+def teacher_dashboard():
+    user_id = session['user_id']
+    schedule = get_cached_schedule(CacheKeys.TEACHER_SCHEDULE, user_id,
+                                   lambda: _build_teacher_schedule(user_id))
+
     return render_template('teacher_dashboard.html', 
                          user_role='teacher', 
                          username=session.get('username', 'teacher'),
                          schedule=schedule)
 
 @web_teacher_bp.route('/teacher/classes')
+@require_role('teacher')
 def teacher_classes():
-    if 'user_id' not in session or session.get('role') != 'teacher':
-        return redirect(url_for('web_auth.login'))
     return render_template('teacher_classes.html', user_role='teacher', username=session.get('username', 'teacher'))
 
 @web_teacher_bp.route('/teacher/attendance')
+@require_role('teacher')
 def teacher_attendance():
-    if 'user_id' not in session or session.get('role') != 'teacher':
-        return redirect(url_for('web_auth.login'))
     return render_template('teacher_attendance.html', user_role='teacher', username=session.get('username', 'teacher'))
 
 @web_teacher_bp.route('/teacher/live-attendance')
+@require_role('teacher')
 def live_attendance():
-    if 'user_id' not in session or session.get('role') != 'teacher':
-        return redirect(url_for('web_auth.login'))
     return render_template('live_attendance.html', user_role='teacher', username=session.get('username', 'teacher'))
 
 @web_teacher_bp.route('/teacher/classes/<int:class_id>')
+@require_role('teacher')
 def teacher_class_details(class_id):
-    if 'user_id' not in session or session.get('role') != 'teacher':
-        return redirect(url_for('web_auth.login'))
-    
     class_obj = Class.query.get(class_id)
     if not class_obj:
         return redirect(url_for('web_teacher.teacher_classes'))
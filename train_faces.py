@@ -3,36 +3,180 @@
 Train face recognition model from student photos.
 Supports multiple photos per student and data augmentation.
 """
+import functools
+import multiprocessing
 import os
 import cv2
 import numpy as np
+from PIL import Image
 from src.face_recognition.matcher import FaceMatcher
 from src.config import config
 import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+# Brightness shifts as lookup tables; same |x + beta| saturation as cv2.convertScaleAbs
+_BRIGHTNESS_LUTS = {
+    beta: np.clip(np.abs(np.arange(256) + beta), 0, 255).astype(np.uint8)
+    for beta in (-20, 20)
+}
+
+
+@functools.lru_cache(maxsize=32)
+def _rotation_matrices(h, w):
+    """Affine matrices for the slight rotations, shared by images of the same size"""
+    return tuple(cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0) for angle in (-10, 10))
 
 
 def augment_image(image):
-    """Generate augmented versions of an image for better training"""
-    augmented = [image]  # Original
+    """Generate augmented versions of an image for better training.
+
+    Returns one (6, H, W[, C]) array: original, flip, two rotations, two brightness shifts.
+    """
+    # One allocation; every transform writes straight into its slot
+    augmented = np.empty((6,) + image.shape, dtype=image.dtype)
+    augmented[0] = image  # Original
     
     # Horizontal flip
-    augmented.append(cv2.flip(image, 1))
+    cv2.flip(image, 1, dst=augmented[1])
     
     # Slight rotations
     h, w = image.shape[:2]
-    for angle in [-10, 10]:
-        M = cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0)
-        rotated = cv2.warpAffine(image, M, (w, h))
-        augmented.append(rotated)
+    for slot, M in enumerate(_rotation_matrices(h, w), start=2):
+        cv2.warpAffine(image, M, (w, h), dst=augmented[slot])
     
-    # Brightness adjustments
-    for beta in [-20, 20]:
-        adjusted = cv2.convertScaleAbs(image, alpha=1.0, beta=beta)
-        augmented.append(adjusted)
+    # Brightness adjustments (cv2.imread always yields uint8 images)
+    for slot, lut in enumerate(_BRIGHTNESS_LUTS.values(), start=4):
+        cv2.LUT(image, lut, dst=augmented[slot])
     
     return augmented
 
-def train_faces(incremental=True):
+def augment_locations(location, width):
+    """Face boxes for augment_image's outputs, given the original's box (None = detect)"""
+    if location is None:
+        return [None] * 6
+    top, right, bottom, left = location
+    mirrored = (top, width - 1 - left, bottom, width - 1 - right)
+    # Original, flip, two rotations (must be re-detected), two brightness shifts
+    return [location, mirrored, None, None, location, location]
+
+# Cosine similarity above which a photo counts as a near-copy of an earlier one
+NEAR_DUPLICATE_SIMILARITY = 0.95
+
+# Photos whose long side exceeds this are decoded at reduced scale; the face
+# encoder works on ~150px crops, so full 4K decodes are wasted work
+_REDUCED_DECODE_MIN_SIDE = 2000
+
+
+def _read_training_image(path):
+    """Decode a photo, letting libjpeg downscale oversized ones during decoding"""
+    try:
+        with Image.open(path) as header:
+            long_side = max(header.size)
+    except Exception:
+        long_side = 0
+    if long_side > 2 * _REDUCED_DECODE_MIN_SIDE:
+        flags = cv2.IMREAD_REDUCED_COLOR_4
+    elif long_side > _REDUCED_DECODE_MIN_SIDE:
+        flags = cv2.IMREAD_REDUCED_COLOR_2
+    else:
+        flags = cv2.IMREAD_COLOR
+    return cv2.imread(path, flags)
+
+
+def _prefetch_images(paths, workers=2, depth=8):
+    """Yield (path, image) in order while up to `depth` later images decode in the background"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(_read_training_image, path)))
+            if len(pending) >= depth:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, future.result()
+
+
+def _encode_user(user, faces_dir, processed_images):
+    """Encode one (username, user_id)'s new photos in a worker process.
+
+    Returns (ids, names, encodings, metadata, added, errors) for the parent to merge.
+    """
+    username, user_id = user
+    matcher = FaceMatcher()
+    count = 0
+    errors = 0
+    user_dir = os.path.join(faces_dir, username)
+
+    print(f"Processing user: {username} (ID {user_id})")
+
+    # Find all image files for this student
+    with os.scandir(user_dir) as entries:
+        image_files = [entry.path for entry in entries
+                       if entry.name.lower().endswith(('.jpg', '.jpeg', '.png')) and entry.is_file()]
+
+    if not image_files:
+        print(f"  No photos found for {username}")
+        return [], [], [], [], 0, 0
+
+    # Only photos not encoded by an earlier run need work
+    new_files = [p for p in image_files if p not in processed_images]
+    if not new_files:
+        print(f"  All {len(image_files)} photo(s) already processed")
+        return [], [], [], [], 0, 0
+
+    print(f"  Found {len(new_files)} new of {len(image_files)} photo(s)")
+
+    # Unit-normalized encodings of this user's fully augmented photos
+    originals = []
+
+    # Process each photo; decoding runs ahead on background threads
+    for img_path, image in _prefetch_images(new_files):
+        try:
+            if image is None:
+                print(f"  Failed to load image: {img_path}")
+                errors += 1
+                continue
+
+            # Detect the face once; flips and brightness shifts keep its box
+            locations = augment_locations(matcher.locate_face(image), image.shape[1])
+            metadata = {'source_image': img_path}
+
+            # Encode the original first; a near-copy of an earlier photo of this
+            # user keeps that encoding but skips the five augmentation passes
+            if matcher.add_known_faces([image], user_id, username, metadata=metadata,
+                                       face_locations=locations[:1]):
+                count += 1
+                encoding = np.asarray(matcher.known_face_encodings[-1], dtype=np.float32)
+                unit = encoding / (np.linalg.norm(encoding) or 1.0)
+                block = [prev for prev in originals if len(prev) == len(unit)]
+                if block and float((np.stack(block) @ unit).max()) > NEAR_DUPLICATE_SIMILARITY:
+                    print(f"  Skipping augmentation of {os.path.basename(img_path)} (near-duplicate)")
+                    continue
+                originals.append(unit)
+            else:
+                errors += 1
+
+            # Generate augmented versions
+            augmented_images = augment_image(image)[1:]
+            print(f"  Generated {len(augmented_images)} augmented versions")
+
+            added = matcher.add_known_faces(augmented_images, user_id, username,
+                                            metadata=metadata,
+                                            face_locations=locations[1:])
+            count += added
+            errors += len(augmented_images) - added
+
+        except Exception as e:
+            print(f"  Error processing {img_path}: {e}")
+            errors += 1
+
+    return (matcher.known_face_ids, matcher.known_face_names, matcher.known_face_encodings,
+            matcher.known_face_metadata, count, errors)
+
+def train_faces(incremental=True, workers=None):
     print("--- Starting Face Training ---")
 
     # Initialize matcher
@@ -40,15 +184,16 @@ def train_faces(incremental=True):
 
     # Load existing database if incremental
     db_path = config.get('recognition.database_path', 'data/face_encodings.pkl')
-    if incremental and os.path.exists(db_path):
+    if incremental:
         matcher.load_known_faces(db_path)
-        print(f"Loaded existing database with {len(matcher.known_face_encodings)} faces")
+        if matcher.known_face_encodings:
+            print(f"Loaded existing database with {len(matcher.known_face_encodings)} faces")
 
     # Build set of processed images
-    processed_images = set()
-    for meta in matcher.known_face_metadata:
-        if meta and 'source_image' in meta:
-            processed_images.add(meta['source_image'])
+    processed_images = frozenset(
+        meta['source_image'] for meta in matcher.known_face_metadata
+        if meta and 'source_image' in meta
+    )
     
     print(f"Found {len(processed_images)} already processed images")
 
@@ -60,74 +205,53 @@ def train_faces(incremental=True):
     count = 0
     errors = 0
 
-    # Iterate through all student directories
-    for username in os.listdir(faces_dir):
-        user_dir = os.path.join(faces_dir, username)
-        if not os.path.isdir(user_dir):
-            continue
+    # Users are independent, so encode them in parallel worker processes
+    # scandir reports entry types from the directory listing, no stat per user
+    with os.scandir(faces_dir) as entries:
+        usernames = [entry.name for entry in entries if entry.is_dir()]
 
-        print(f"Processing user: {username}")
-        
-        # Get User ID from database using sqlite3
+    # Resolve every user ID with one query instead of a connection per user
+    try:
+        conn = sqlite3.connect('data/attendance.db')
         try:
-            conn = sqlite3.connect('data/attendance.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-            result = cursor.fetchone()
+            placeholders = ','.join('?' * len(usernames))
+            user_ids = dict(conn.execute(
+                f"SELECT username, id FROM users WHERE username IN ({placeholders})", usernames
+            ).fetchall()) if usernames else {}
+        finally:
             conn.close()
-            
-            if not result:
-                print(f"  Warning: User '{username}' not found in database. Skipping.")
-                continue
-                
-            user_id = result[0]
-            print(f"  Found user ID: {user_id}")
-        except Exception as e:
-            print(f"  Error querying database for {username}: {e}")
-            continue
-
-        # Find all image files for this student
-        image_files = []
-        for file in os.listdir(user_dir):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                image_files.append(os.path.join(user_dir, file))
-
-        if not image_files:
-            print(f"  No photos found for {username}")
-            continue
-
-        print(f"  Found {len(image_files)} photo(s)")
-
-        # Process each photo
-        for img_path in image_files:
-            try:
-                # Check if already processed
-                if img_path in processed_images:
-                    print(f"  Skipping {os.path.basename(img_path)} (already processed)")
-                    continue
-
-                # Load image
-                image = cv2.imread(img_path)
-                if image is None:
-                    print(f"  Failed to load image: {img_path}")
-                    errors += 1
-                    continue
-
-                # Generate augmented versions
-                augmented_images = augment_image(image)
-                print(f"  Generated {len(augmented_images)} augmented versions")
+    except Exception as e:
+        print(f"Error querying database for user IDs: {e}")
+        return
 
-                # Add each augmented version to matcher
-                for aug_img in augmented_images:
-                    success = matcher.add_known_face(aug_img, user_id, username, metadata={'source_image': img_path})
-                    if success:
-                        count += 1
-                    else:
-                        errors += 1
+    users = []
+    for username in usernames:
+        if username in user_ids:
+            users.append((username, user_ids[username]))
+        else:
+            print(f"Warning: User '{username}' not found in database. Skipping.")
 
-            except Exception as e:
-                print(f"  Error processing {img_path}: {e}")
-                errors += 1
+    encode = functools.partial(_encode_user, faces_dir=faces_dir, processed_images=processed_images)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        # In-process, e.g. inside the daemonic trainer process, which may not have children
+        results = map(encode, users)
+        executor = None
+    else:
+        # spawn: never fork a threaded caller such as the web server
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        results = executor.map(encode, users, chunksize=1)
+    try:
+        for ids, names, encodings, metadata, added, failed in results:
+            matcher.known_face_ids.extend(ids)
+            matcher.known_face_names.extend(names)
+            matcher.known_face_encodings.extend(encodings)
+            matcher.known_face_metadata.extend(metadata)
+            count += added
+            errors += failed
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     # Save the database
     if len(matcher.known_face_encodings) > 0: